@@ -1,9 +1,25 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 import os
+import io
+import argparse
 import json
+import time
+import cProfile
+import pstats
+import threading
 from werkzeug.utils import secure_filename
 from gerador_placas import GeradorPlacas
+from cache_arquivos import cache_dataframes
+from fila_trabalhos import FilaTrabalhos
+from codigo_barras import ean13_valido
+from cache_codigos_barras import cache_codigos_barras
+from cache_previews import cache_previews
+from preview_raster import MAX_PREVIEW_LOTE, MAX_PIXELS_FOLHA
+from plano_layout import cache_planos
+from repositorio_perfis import RepositorioPerfis
+from metricas import metricas
+from saida_streaming import gerar_zip_em_partes, PAGINAS_POR_PARTE
 from datetime import datetime
 
 app = Flask(__name__)
@@ -25,10 +41,134 @@ os.makedirs(os.path.join(ASSETS_FOLDER, 'fonts'), exist_ok=True)
 os.makedirs(os.path.join(ASSETS_FOLDER, 'backgrounds'), exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# Arquivos grandes são lidos em blocos; PLACAS_MAX_UPLOAD_MB aumenta (ou reduz) o teto dos uploads
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('PLACAS_MAX_UPLOAD_MB', 512)) * 1024 * 1024
 
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 
+# Gerador único do processo: não guarda estado por requisição e os caches que usa são compartilhados
+gerador = GeradorPlacas(BASE_DIR)
+repositorio_perfis = RepositorioPerfis(PERFIS_FOLDER)
+
+# PDFs gerados na própria requisição, por processo: as outras threads ficam livres para os endpoints leves
+limite_renderizacao = threading.BoundedSemaphore(int(os.environ.get('PLACAS_RENDER_SIMULTANEOS', 2)))
+ESPERA_RENDERIZACAO = float(os.environ.get('PLACAS_ESPERA_RENDER', 5))
+
+def servidor_ocupado():
+    resposta = jsonify({'error': 'Servidor ocupado gerando outras placas, tente novamente em instantes'})
+    resposta.headers['Retry-After'] = str(int(ESPERA_RENDERIZACAO) or 1)
+    return resposta, 503
+
+def config_requisicao(data):
+    """Configuração enviada na requisição ou, com 'perfil', a do perfil salvo (None se não existe)"""
+    nome_perfil = data.get('perfil')
+    if nome_perfil:
+        return cache_planos.config_perfil(repositorio_perfis.caminho(nome_perfil))
+    return data.get('config', {})
+
+def dpi_requisicao(data):
+    """DPI pedido para o preview (None usa o padrão do servidor)"""
+    dpi = data.get('dpi')
+    return None if dpi is None else int(dpi)
+
+def manifesto_invalido(data):
+    """Resposta 400 se o manifesto pedido não for um nome (texto), senão None"""
+    manifesto = data.get('manifesto')
+    if manifesto is not None and not isinstance(manifesto, str):
+        return jsonify({'error': 'Manifesto deve ser um texto'}), 400
+    return None
+
+def resposta_condicional(dados, etag):
+    """JSON com ETag: o navegador revalida a cada uso e recebe 304 se nada mudou"""
+    resposta = jsonify(dados)
+    resposta.set_etag(etag)
+    resposta.cache_control.no_cache = True
+    return resposta.make_conditional(request)
+
+def caminho_perfil(trabalho_id):
+    return os.path.join(OUTPUT_FOLDER, f'perfil_{trabalho_id}.prof')
+
+def executar_trabalho(trabalho_id, parametros, progresso):
+    """Gera o PDF de um trabalho da fila"""
+    filepath = os.path.join(UPLOAD_FOLDER, parametros['filename'])
+    if not os.path.exists(filepath):
+        raise ValueError('Arquivo não encontrado')
+    
+    def gerar():
+        return gerador.processar_arquivo(
+            filepath,
+            parametros['config'],
+            parametros['produtos_selecionados'],
+            output_file=os.path.join(OUTPUT_FOLDER, f'placas_{trabalho_id}.pdf'),
+            progresso=progresso,
+            manifesto=parametros.get('manifesto'),
+            somente_alterados=parametros.get('somente_alterados', False)
+        )
+    
+    with metricas.cronometrar('placas_trabalho_segundos'):
+        if not parametros.get('perfilar'):
+            return gerar()
+        
+        # Perfil opcional do trabalho (cProfile só mede a thread que o ativou)
+        perfil = cProfile.Profile()
+        try:
+            return perfil.runcall(gerar)
+        finally:
+            perfil.dump_stats(caminho_perfil(trabalho_id))
+
+# Fila de geração de PDFs em segundo plano
+fila_trabalhos = FilaTrabalhos(
+    os.path.join(BASE_DIR, 'trabalhos.db'),
+    executar_trabalho,
+    workers=int(os.environ.get('PLACAS_WORKERS_TRABALHOS', 2)),
+    # Com vários processos, só quem sobe o servidor (o master do gunicorn) devolve à fila os interrompidos
+    recuperar=os.environ.get('PLACAS_RECUPERAR_TRABALHOS', '1') == '1'
+)
+
+# Servidor de desenvolvimento com debug: o processo que só vigia os arquivos (reloader) não executa trabalhos
+DEBUG = os.environ.get('PLACAS_DEBUG', '0') == '1'
+vigia_reloader = __name__ == '__main__' and DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+# PLACAS_FILA=0: este processo só enfileira e a fila roda em um processo dedicado (fila.py)
+if os.environ.get('PLACAS_FILA', '1') == '1' and not vigia_reloader:
+    fila_trabalhos.iniciar()
+
+def encerrar(timeout=None):
+    """Para a fila esperando os trabalhos em andamento (os que não terminarem voltam à fila no próximo início)"""
+    fila_trabalhos.parar(timeout)
+
+metricas.descrever('placas_trabalho_segundos', 'Duração dos trabalhos da fila')
+metricas.medidor(
+    'placas_trabalhos',
+    lambda: {(('estado', estado),): n for estado, n in fila_trabalhos.contagem_por_estado().items()},
+    'Trabalhos da fila por estado'
+)
+metricas.medidor(
+    'placas_cache_arquivos',
+    lambda: {(('medida', chave),): valor for chave, valor in cache_dataframes.estatisticas().items()},
+    'Itens, bytes, acertos e falhas do cache de arquivos lidos'
+)
+
+@app.before_request
+def iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
+
+@app.after_request
+def registrar_latencia(response):
+    inicio = getattr(g, 'inicio_requisicao', None)
+    if inicio is not None:
+        # A regra (e não a URL) evita uma série por id de trabalho ou nome de arquivo
+        endpoint = request.url_rule.rule if request.url_rule else 'desconhecido'
+        metricas.observar(
+            'placas_http_requisicao_segundos', time.perf_counter() - inicio,
+            endpoint=endpoint, metodo=request.method
+        )
+        metricas.contar(
+            'placas_http_requisicoes_total',
+            endpoint=endpoint, metodo=request.method, status=response.status_code
+        )
+    return response
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -46,8 +186,10 @@ def gerar_codigo_barras():
         if len(codigo) != 13 or not codigo.isdigit():
             return jsonify({'error': 'Código deve ter 13 dígitos numéricos para EAN13'}), 400
         
+        if not ean13_valido(codigo):
+            return jsonify({'error': 'Dígito verificador do código EAN13 inválido'}), 400
+        
         # Usar o gerador do GeradorPlacas
-        gerador = GeradorPlacas(BASE_DIR)
         barcode_filename = gerador.gerar_codigo_barras(codigo)
         
         if barcode_filename:
@@ -64,11 +206,7 @@ def gerar_codigo_barras():
 # Endpoint para verificar código de barras
 @app.route('/api/verificar_codigo_barras/<codigo>')
 def verificar_codigo_barras(codigo):
-    filepath = os.path.join(BARCODES_FOLDER, f"barcode_{codigo}.png")
-    if os.path.exists(filepath):
-        return jsonify({'existe': True}), 200
-    else:
-        return jsonify({'existe': False}), 200
+    return jsonify({'existe': cache_codigos_barras(BARCODES_FOLDER).existe(codigo)}), 200
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
@@ -83,20 +221,19 @@ def upload_file():
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
+        # Um novo upload com o mesmo nome substitui a versão em cache
+        cache_dataframes.invalidar(filepath)
         
         try:
-            gerador = GeradorPlacas(BASE_DIR)
-            df = gerador.ler_arquivo(filepath)
-            
-            # Validar dados e identificar problemas
-            problemas = gerador.validar_dados(df)
-            preview = df.head(10).to_dict('records')
+            # Validar dados e identificar problemas (em blocos para arquivos grandes)
+            preview_df, total_produtos, problemas = gerador.analisar_arquivo(filepath)
+            preview = preview_df.to_dict('records')
             
             return jsonify({
                 'message': 'Arquivo enviado com sucesso',
                 'filename': filename,
                 'preview': preview,
-                'total_produtos': len(df),
+                'total_produtos': total_produtos,
                 'problemas': problemas,
                 'total_problemas': len(problemas)
             }), 200
@@ -108,14 +245,20 @@ def upload_file():
 @app.route('/api/perfis', methods=['GET', 'POST'])
 def gerenciar_perfis():
     if request.method == 'GET':
-        perfis = []
-        for file in os.listdir(PERFIS_FOLDER):
-            if file.endswith('.json'):
-                with open(os.path.join(PERFIS_FOLDER, file), 'r', encoding='utf-8') as f:
-                    perfil_data = json.load(f)
-                    perfis.append(perfil_data)
+        # Só metadados (nome e datas): a configuração completa vem de /api/perfis/<nome>
+        try:
+            offset = max(0, int(request.args.get('offset', 0)))
+            limite = int(request.args['limite']) if request.args.get('limite') else None
+        except ValueError:
+            return jsonify({'error': 'offset e limite devem ser números inteiros'}), 400
         
-        return jsonify({'perfis': perfis}), 200
+        perfis, total, etag = repositorio_perfis.listar(offset, limite)
+        return resposta_condicional({
+            'perfis': perfis,
+            'total': total,
+            'offset': offset,
+            'limite': limite
+        }, etag)
     
     elif request.method == 'POST':
         data = request.json
@@ -125,36 +268,21 @@ def gerenciar_perfis():
         if not nome_perfil:
             return jsonify({'error': 'Nome do perfil é obrigatório'}), 400
         
-        perfil_data = {
-            'nome': nome_perfil,
-            'config': config,
-            'criado_em': datetime.now().isoformat()
-        }
-        
-        filename = secure_filename(nome_perfil + '.json')
-        filepath = os.path.join(PERFIS_FOLDER, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(perfil_data, f, ensure_ascii=False, indent=2)
+        repositorio_perfis.salvar(nome_perfil, config)
         
         return jsonify({'message': 'Perfil salvo com sucesso'}), 200
 
 @app.route('/api/perfis/<nome_perfil>', methods=['GET', 'DELETE'])
 def gerenciar_perfil(nome_perfil):
-    filename = secure_filename(nome_perfil + '.json')
-    filepath = os.path.join(PERFIS_FOLDER, filename)
-    
     if request.method == 'GET':
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                perfil_data = json.load(f)
-            return jsonify(perfil_data), 200
+        perfil_data, etag = repositorio_perfis.obter(nome_perfil)
+        if perfil_data is not None:
+            return resposta_condicional(perfil_data, etag)
         else:
             return jsonify({'error': 'Perfil não encontrado'}), 404
     
     elif request.method == 'DELETE':
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        if repositorio_perfis.excluir(nome_perfil):
             return jsonify({'message': 'Perfil excluído com sucesso'}), 200
         else:
             return jsonify({'error': 'Perfil não encontrado'}), 404
@@ -169,8 +297,12 @@ def preview_placa():
         if not produto:
             return jsonify({'error': 'Dados do produto são obrigatórios'}), 400
         
-        gerador = GeradorPlacas(BASE_DIR)
-        preview_path = gerador.gerar_preview_placa(produto, config)
+        try:
+            dpi = dpi_requisicao(data)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'DPI inválido'}), 400
+        
+        preview_path = gerador.gerar_preview_placa(produto, config, dpi)
         
         return jsonify({
             'preview_url': f'/api/preview_image/{os.path.basename(preview_path)}'
@@ -179,34 +311,125 @@ def preview_placa():
     except Exception as e:
         return jsonify({'error': f'Erro ao gerar preview: {str(e)}'}), 500
 
+@app.route('/api/preview_lote', methods=['POST'])
+def preview_lote():
+    """Folha de contatos com as miniaturas das placas de vários produtos de um arquivo"""
+    try:
+        data = request.json
+        filename = data.get('filename')
+        config = config_requisicao(data)
+        indices = data.get('indices')
+        
+        if not filename:
+            return jsonify({'error': 'Nome do arquivo é obrigatório'}), 400
+        if config is None:
+            return jsonify({'error': 'Perfil não encontrado'}), 404
+        
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
+        
+        if not os.path.exists(filepath):
+            return jsonify({'error': 'Arquivo não encontrado'}), 404
+        
+        try:
+            dpi = dpi_requisicao(data)
+            colunas = int(data['colunas']) if data.get('colunas') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'DPI ou colunas inválidos'}), 400
+        
+        total_produtos = gerador.total_linhas(filepath)
+        if indices is None:
+            indices = list(range(min(total_produtos, MAX_PREVIEW_LOTE)))
+        elif not isinstance(indices, list) or not all(isinstance(i, int) for i in indices):
+            return jsonify({'error': 'Índices devem ser uma lista de números inteiros'}), 400
+        if len(indices) > MAX_PREVIEW_LOTE:
+            return jsonify({'error': f'No máximo {MAX_PREVIEW_LOTE} produtos por folha de contatos'}), 400
+        if any(i < 0 or i >= total_produtos for i in indices):
+            return jsonify({'error': 'Índice do produto inválido'}), 400
+        
+        # Só os produtos válidos entram na folha, na ordem pedida
+        produtos_df = gerador.ler_linhas(filepath, indices)
+        problemas = gerador.validar_dataframe(produtos_df)
+        produtos = []
+        incluidos = []
+        invalidos = []
+        for pos, (indice, produto) in enumerate(zip(indices, produtos_df.to_dict('records'))):
+            if problemas.get(pos):
+                invalidos.append({'indice': indice, 'problemas': problemas[pos]})
+            else:
+                produtos.append(produto)
+                incluidos.append(indice)
+        
+        if not produtos:
+            return jsonify({'error': 'Nenhum produto válido para o preview', 'invalidos': invalidos}), 400
+        if gerador.pixels_folha_contatos(len(produtos), config, dpi) > MAX_PIXELS_FOLHA:
+            return jsonify({'error': 'Folha de contatos grande demais: reduza o DPI ou a quantidade de produtos'}), 400
+        
+        if not limite_renderizacao.acquire(timeout=ESPERA_RENDERIZACAO):
+            return servidor_ocupado()
+        try:
+            preview_path = gerador.gerar_folha_contatos(produtos, config, dpi, colunas)
+        finally:
+            limite_renderizacao.release()
+        
+        return jsonify({
+            'preview_url': f'/api/preview_image/{os.path.basename(preview_path)}',
+            'indices': incluidos,
+            'invalidos': invalidos,
+            'total_produtos': total_produtos
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Erro ao gerar folha de contatos: {str(e)}'}), 500
+
 @app.route('/api/preview_image/<filename>')
 def serve_preview_image(filename):
     previews_folder = os.path.join(BASE_DIR, 'previews')
-    filepath = os.path.join(previews_folder, filename)
+    png = cache_previews(previews_folder).obter(secure_filename(filename))
     
-    if os.path.exists(filepath):
-        return send_file(filepath, mimetype='image/png')
-    else:
+    if png is None:
         return jsonify({'error': 'Imagem não encontrada'}), 404
+    
+    # O nome já é o hash do conteúdo: a mesma URL sempre tem a mesma imagem
+    return send_file(
+        io.BytesIO(png),
+        mimetype='image/png',
+        etag=filename.rsplit('.', 1)[0],
+        max_age=86400
+    )
 
 @app.route('/api/gerar_placas', methods=['POST'])
 def gerar_placas():
     try:
         data = request.json
         filename = data.get('filename')
-        config = data.get('config', {})
-        produtos_selecionados = data.get('produtos_selecionados', [])
+        config = config_requisicao(data)
+        produtos_selecionados = data.get('produtos_selecionados')
         
         if not filename:
             return jsonify({'error': 'Nome do arquivo é obrigatório'}), 400
         
+        if config is None:
+            return jsonify({'error': 'Perfil não encontrado'}), 404
+        
+        erro = manifesto_invalido(data)
+        if erro:
+            return erro
+        
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         
         if not os.path.exists(filepath):
             return jsonify({'error': 'Arquivo não encontrado'}), 404
         
-        gerador = GeradorPlacas(BASE_DIR)
-        output_file, relatorio = gerador.processar_arquivo(filepath, config, produtos_selecionados)
+        if not limite_renderizacao.acquire(timeout=ESPERA_RENDERIZACAO):
+            return servidor_ocupado()
+        try:
+            output_file, relatorio = gerador.processar_arquivo(
+                filepath, config, produtos_selecionados,
+                manifesto=data.get('manifesto'),
+                somente_alterados=bool(data.get('somente_alterados', False))
+            )
+        finally:
+            limite_renderizacao.release()
         
         return jsonify({
             'message': 'PDF gerado com sucesso',
@@ -217,6 +440,139 @@ def gerar_placas():
     except Exception as e:
         return jsonify({'error': f'Erro ao gerar PDF: {str(e)}'}), 500
 
+@app.route('/api/gerar_placas_stream', methods=['POST'])
+def gerar_placas_stream():
+    """Gera as placas enviando um ZIP com um PDF a cada N páginas, conforme ficam prontos"""
+    data = request.json
+    filename = data.get('filename')
+    config = config_requisicao(data)
+    produtos_selecionados = data.get('produtos_selecionados')
+    
+    if not filename:
+        return jsonify({'error': 'Nome do arquivo é obrigatório'}), 400
+    
+    try:
+        paginas_por_parte = data.get('paginas_por_parte')
+        paginas_por_parte = PAGINAS_POR_PARTE if paginas_por_parte is None else int(paginas_por_parte)
+    except (TypeError, ValueError):
+        paginas_por_parte = 0
+    if paginas_por_parte < 1:
+        return jsonify({'error': 'Páginas por parte deve ser um número inteiro maior que zero'}), 400
+    
+    if config is None:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    
+    erro = manifesto_invalido(data)
+    if erro:
+        return erro
+    
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
+    
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    
+    if not limite_renderizacao.acquire(timeout=ESPERA_RENDERIZACAO):
+        return servidor_ocupado()
+    
+    try:
+        delta = gerador.execucao_delta(
+            data.get('manifesto'), config, bool(data.get('somente_alterados', False)), produtos_selecionados
+        )
+        partes = gerar_zip_em_partes(gerador, filepath, config, produtos_selecionados, paginas_por_parte, delta)
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        resposta = Response(
+            stream_with_context(partes),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename=placas_{timestamp}.zip'}
+        )
+        # A geração acontece enquanto o ZIP é enviado: a vaga só é liberada ao fechar a resposta
+        resposta.call_on_close(limite_renderizacao.release)
+    except Exception:
+        # Sem resposta criada, call_on_close nunca roda: a vaga é devolvida aqui
+        limite_renderizacao.release()
+        raise
+    return resposta
+
+@app.route('/api/trabalhos', methods=['POST'])
+def enviar_trabalho():
+    """Coloca a geração do PDF na fila e retorna imediatamente"""
+    data = request.json
+    filename = data.get('filename')
+    config = config_requisicao(data)
+    
+    if not filename:
+        return jsonify({'error': 'Nome do arquivo é obrigatório'}), 400
+    
+    if config is None:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    
+    erro = manifesto_invalido(data)
+    if erro:
+        return erro
+    
+    filename = secure_filename(filename)
+    if not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    
+    trabalho_id = fila_trabalhos.enviar({
+        'filename': filename,
+        'config': config,
+        'produtos_selecionados': data.get('produtos_selecionados'),
+        'perfilar': bool(data.get('perfilar', False)),
+        # Com manifesto (normalmente a loja), a geração fica registrada para o modo delta
+        'manifesto': data.get('manifesto'),
+        'somente_alterados': bool(data.get('somente_alterados', False))
+    }, loja=data.get('loja'))
+    
+    return jsonify({
+        'id': trabalho_id,
+        'status_url': f'/api/trabalhos/{trabalho_id}'
+    }), 202
+
+@app.route('/api/trabalhos/<trabalho_id>', methods=['GET'])
+def status_trabalho(trabalho_id):
+    status = fila_trabalhos.status(trabalho_id)
+    if status is None:
+        return jsonify({'error': 'Trabalho não encontrado'}), 404
+    
+    if status['estado'] == 'concluido':
+        status['pdf_url'] = f'/api/trabalhos/{trabalho_id}/resultado'
+    if os.path.exists(caminho_perfil(trabalho_id)):
+        status['perfil_url'] = f'/api/trabalhos/{trabalho_id}/perfil'
+    return jsonify(status), 200
+
+@app.route('/api/trabalhos/<trabalho_id>/cancelar', methods=['POST'])
+def cancelar_trabalho(trabalho_id):
+    if fila_trabalhos.status(trabalho_id) is None:
+        return jsonify({'error': 'Trabalho não encontrado'}), 404
+    
+    if fila_trabalhos.cancelar(trabalho_id):
+        return jsonify({'message': 'Cancelamento solicitado'}), 200
+    return jsonify({'error': 'Trabalho já finalizado'}), 409
+
+@app.route('/api/trabalhos/<trabalho_id>/resultado')
+def resultado_trabalho(trabalho_id):
+    filepath = fila_trabalhos.caminho_resultado(trabalho_id)
+    if filepath and os.path.exists(filepath):
+        return send_file(filepath, as_attachment=True)
+    return jsonify({'error': 'Resultado não disponível'}), 404
+
+@app.route('/api/trabalhos/<trabalho_id>/perfil')
+def perfil_trabalho(trabalho_id):
+    """Perfil do trabalho: resumo em texto ou, com ?formato=prof, o arquivo do cProfile"""
+    filepath = caminho_perfil(secure_filename(trabalho_id))
+    if not os.path.exists(filepath):
+        return jsonify({'error': 'Perfil não disponível'}), 404
+    
+    if request.args.get('formato') == 'prof':
+        return send_file(filepath, as_attachment=True, download_name=f'perfil_{trabalho_id}.prof')
+    
+    saida = io.StringIO()
+    estatisticas = pstats.Stats(filepath, stream=saida)
+    estatisticas.sort_stats(request.args.get('ordem', 'cumulative')).print_stats(int(request.args.get('linhas', 60)))
+    return Response(saida.getvalue(), mimetype='text/plain')
+
 @app.route('/api/gerar_placas_confirmacao', methods=['POST'])
 def gerar_placas_confirmacao():
     try:
@@ -233,13 +589,12 @@ def gerar_placas_confirmacao():
         if not os.path.exists(filepath):
             return jsonify({'error': 'Arquivo não encontrado'}), 404
         
-        gerador = GeradorPlacas(BASE_DIR)
-        produtos_df = gerador.ler_arquivo(filepath)
+        total_produtos = gerador.total_linhas(filepath)
         
-        if produto_index >= len(produtos_df):
+        if produto_index >= total_produtos:
             return jsonify({'error': 'Índice do produto inválido'}), 400
         
-        produto = produtos_df.iloc[produto_index].to_dict()
+        produto = gerador.ler_linhas(filepath, [produto_index]).iloc[0].to_dict()
         
         # Validar produto individual
         problemas = gerador.validar_produto(produto)
@@ -250,20 +605,71 @@ def gerar_placas_confirmacao():
                 'produto': produto
             }), 200
         
+        try:
+            dpi = dpi_requisicao(data)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'DPI inválido'}), 400
+        
         # Gerar preview
-        preview_path = gerador.gerar_preview_placa(produto, config)
+        preview_path = gerador.gerar_preview_placa(produto, config, dpi)
         
         return jsonify({
             'valido': True,
             'preview_url': f'/api/preview_image/{os.path.basename(preview_path)}',
             'produto': produto,
-            'total_produtos': len(produtos_df),
+            'total_produtos': total_produtos,
             'produto_atual': produto_index + 1
         }), 200
     
     except Exception as e:
         return jsonify({'error': f'Erro ao processar produto: {str(e)}'}), 500
 
+@app.route('/api/validar_produtos', methods=['POST'])
+def validar_produtos():
+    """Valida vários produtos de um arquivo em uma única requisição, sem gerar previews"""
+    try:
+        data = request.json
+        filename = data.get('filename')
+        indices = data.get('indices')
+        
+        if not filename:
+            return jsonify({'error': 'Nome do arquivo é obrigatório'}), 400
+        
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
+        
+        if not os.path.exists(filepath):
+            return jsonify({'error': 'Arquivo não encontrado'}), 404
+        
+        produtos_df = gerador.ler_arquivo(filepath)
+        
+        # Aceita uma lista de índices ou um intervalo [inicio, fim)
+        if indices is None:
+            inicio = int(data.get('inicio', 0))
+            fim = int(data.get('fim', len(produtos_df)))
+            indices = list(range(max(inicio, 0), min(fim, len(produtos_df))))
+        elif not isinstance(indices, list) or not all(isinstance(i, int) for i in indices):
+            return jsonify({'error': 'Índices devem ser uma lista de números inteiros'}), 400
+        
+        resultados = gerador.validar_lote(produtos_df, indices)
+        
+        # NDJSON: uma linha por produto, enviada conforme os blocos são validados
+        if data.get('formato') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+            linhas = (json.dumps(resultado, ensure_ascii=False) + '\n' for resultado in resultados)
+            return Response(linhas, mimetype='application/x-ndjson')
+        
+        resultados = list(resultados)
+        validos = sum(1 for resultado in resultados if resultado['valido'])
+        
+        return jsonify({
+            'resultados': resultados,
+            'total_produtos': len(produtos_df),
+            'total_validos': validos,
+            'total_invalidos': len(resultados) - validos
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Erro ao validar produtos: {str(e)}'}), 500
+
 @app.route('/api/download/<filename>')
 def download_file(filename):
     filepath = os.path.join(OUTPUT_FOLDER, filename)
@@ -310,6 +716,11 @@ def health_check():
         }
     }), 200
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Métricas no formato de exposição do Prometheus"""
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint não encontrado'}), 404
@@ -318,11 +729,27 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': 'Erro interno do servidor'}), 500
 
+def aquecer():
+    """Deixa fontes, fundos e planos prontos antes de atender o primeiro pedido"""
+    resumo = gerador.aquecer()
+    print(
+        f"Aquecimento: {resumo['fontes']} fontes, {resumo['fundos']} fundos, "
+        f"{resumo['tamanhos']} tamanhos em {resumo['segundos']}s"
+    )
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor do gerador de placas')
+    parser.add_argument('--preload', action='store_true', help='aquecer o gerador antes de aceitar conexões')
+    args = parser.parse_args()
+    
     print("Iniciando servidor Flask...")
     print(f"Upload folder: {UPLOAD_FOLDER}")
     print(f"Output folder: {OUTPUT_FOLDER}")
     print(f"Barcodes folder: {BARCODES_FOLDER}")
-    print("Servidor rodando em http://localhost:5000")
+    if args.preload or os.environ.get('PLACAS_PRELOAD') == '1':
+        aquecer()
+    porta = int(os.environ.get('PLACAS_PORTA', 5000))
+    print(f"Servidor rodando em http://localhost:{porta}")
     
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Servidor de desenvolvimento; em produção use o gunicorn (gunicorn -c gunicorn.conf.py wsgi:app)
+    app.run(debug=DEBUG, port=porta)
\ No newline at end of file
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # sem pyarrow os uploads continuam sendo lidos do arquivo original
+    pa = None
+
+
+def _assinatura(arquivo_path):
+    info = os.stat(arquivo_path)
+    return [info.st_mtime_ns, info.st_size]
+
+
+def _tabela(df):
+    """Tabela Arrow com os mesmos tipos do DataFrame, ou None se alguma coluna não pode ser guardada sem perda"""
+    if not df.columns.is_unique or not all(isinstance(col, str) for col in df.columns):
+        return None
+    for col in df.columns:
+        serie = df[col]
+        # Coluna de texto só vira string do Arrow se todos os valores forem texto (misturas mudariam a validação)
+        if serie.dtype == object and not serie.dropna().map(type).eq(str).all():
+            return None
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+
+
+def _dataframe(lote, inicio=0):
+    df = lote.to_pandas()
+    # O Arrow devolve None nas colunas de texto; o pandas lê NaN
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].fillna(np.nan)
+    df.index = pd.RangeIndex(inicio, inicio + len(df))
+    return df
+
+
+class ConversaoColunar:
+    """Grava bloco a bloco (DataFrames já normalizados) o arquivo Arrow de um upload"""
+
+    def __init__(self, arquivo_path, destino):
+        self.arquivo_path = arquivo_path
+        self.destino = destino
+        self.temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._escritor = None
+        self._esquema = None
+        self.falhou = False
+
+    def adicionar(self, bloco):
+        if self.falhou:
+            return
+        tabela = _tabela(bloco)
+        try:
+            if tabela is None:
+                raise ValueError('coluna com tipos misturados ou nomes repetidos')
+            if self._escritor is None:
+                meta = {
+                    'assinatura': _assinatura(self.arquivo_path),
+                    'original': os.path.basename(self.arquivo_path)
+                }
+                self._esquema = tabela.schema.with_metadata({**tabela.schema.metadata, b'placas': json.dumps(meta)})
+                self._escritor = pa.ipc.new_file(self.temporario, self._esquema)
+            elif not tabela.schema.equals(self._esquema, check_metadata=False):
+                # Blocos com tipos diferentes: guardar juntos mudaria os tipos de algum deles
+                raise ValueError('blocos com tipos diferentes')
+            self._escritor.write_table(tabela.replace_schema_metadata(self._esquema.metadata))
+        except (OSError, ValueError, pa.ArrowException) as e:
+            print(f"Upload {os.path.basename(self.arquivo_path)} não convertido para Arrow: {e}")
+            self.descartar()
+
+    def concluir(self):
+        """Publica o arquivo Arrow; True se a conversão deu certo"""
+        if self.falhou or self._escritor is None:
+            self.descartar()
+            return False
+        self._escritor.close()
+        self._escritor = None
+        os.replace(self.temporario, self.destino)
+        return True
+
+    def descartar(self):
+        self.falhou = True
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+        if os.path.exists(self.temporario):
+            os.remove(self.temporario)
+
+
+class ArmazemColunar:
+    """Uploads convertidos uma vez para Arrow (ao lado do original, que é mantido) e lidos com memory map"""
+
+    def caminho(self, arquivo_path):
+        return arquivo_path + '.arrow'
+
+    def _abrir(self, arquivo_path):
+        """Leitor do arquivo Arrow, se existe e corresponde à versão atual do original"""
+        if pa is None:
+            return None
+        try:
+            leitor = pa.ipc.open_file(pa.memory_map(self.caminho(arquivo_path), 'r'))
+            meta = json.loads(leitor.schema.metadata[b'placas'])
+            if meta['assinatura'] != _assinatura(arquivo_path):
+                return None
+            return leitor
+        except (OSError, KeyError, ValueError, TypeError, pa.ArrowInvalid):
+            return None
+
+    def convertido(self, arquivo_path):
+        return self._abrir(arquivo_path) is not None
+
+    def conversao(self, arquivo_path):
+        """Conversão do upload para Arrow, ou None se não há pyarrow ou o arquivo já foi convertido"""
+        if pa is None or self.convertido(arquivo_path):
+            return None
+        return ConversaoColunar(arquivo_path, self.caminho(arquivo_path))
+
+    def converter(self, arquivo_path, df):
+        conversao = self.conversao(arquivo_path)
+        if conversao is None:
+            return False
+        conversao.adicionar(df)
+        return conversao.concluir()
+
+    def ler(self, arquivo_path):
+        """DataFrame completo (mesmos tipos da leitura original) ou None"""
+        leitor = self._abrir(arquivo_path)
+        if leitor is None:
+            return None
+        return _dataframe(leitor.read_all())
+
+    def ler_blocos(self, arquivo_path, tamanho_bloco):
+        """Gerador de DataFrames de tamanho_bloco linhas (independente dos lotes gravados) ou None"""
+        leitor = self._abrir(arquivo_path)
+        if leitor is None:
+            return None
+
+        def blocos():
+            # Com memory map, read_all e slice não copiam os dados: só cada bloco é convertido para pandas
+            tabela = leitor.read_all()
+            for inicio in range(0, tabela.num_rows, tamanho_bloco):
+                yield _dataframe(tabela.slice(inicio, tamanho_bloco), inicio)
+        return blocos()
+
+    def total(self, arquivo_path):
+        leitor = self._abrir(arquivo_path)
+        if leitor is None:
+            return None
+        return sum(leitor.get_batch(i).num_rows for i in range(leitor.num_record_batches))
+
+    def ler_linhas(self, arquivo_path, posicoes):
+        """Só as linhas pedidas (como df.iloc[posicoes]), sem materializar o resto, ou None"""
+        leitor = self._abrir(arquivo_path)
+        if leitor is None:
+            return None
+        tabela = leitor.read_all()
+        posicoes = np.asarray(posicoes, dtype=np.int64).reshape(-1)
+        if ((posicoes < -tabela.num_rows) | (posicoes >= tabela.num_rows)).any():
+            raise IndexError('positional indexers are out-of-bounds')
+        posicoes = np.where(posicoes < 0, posicoes + tabela.num_rows, posicoes)
+        df = _dataframe(tabela.take(pa.array(posicoes)))
+        df.index = posicoes
+        return df
+
+
+armazem_colunar = ArmazemColunar()
@@ -0,0 +1,239 @@
+"""Mede as etapas do gerador de placas (leitura, validação, PDF e preview) e grava um relatório JSON
+
+Cada caso roda em um processo novo e em uma pasta própria, com uma cópia nova do catálogo,
+para que o pico de memória (RSS) e os caches em disco (previews, .arrow, .indice.npz) sejam só dele.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--linhas 1000 10000] [--formatos csv xlsx]
+        [--tamanhos A3 A3+ A4 A5 A6] [--variantes simples fundo fonte imagem_codigo]
+        [--repeticoes 3] [--saida resultado.json] [--comparar anterior.json]
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: sem resource o pico de RSS não é medido
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reportlab
+from PIL import Image, ImageDraw
+
+from catalogo_sintetico import gerar_catalogo, salvar_catalogo
+
+TAMANHOS = ['A3', 'A3+', 'A4', 'A5', 'A6']
+VARIANTES = ['simples', 'fundo', 'fonte', 'imagem_codigo']
+FONTE_TTF = os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'Vera.ttf')
+
+
+def preparar_base(pasta, fonte_ttf):
+    """Cria a estrutura de pastas do gerador com um fundo e uma fonte TTF de teste"""
+    os.makedirs(os.path.join(pasta, 'assets', 'backgrounds'), exist_ok=True)
+    os.makedirs(os.path.join(pasta, 'assets', 'fonts'), exist_ok=True)
+
+    fundo = Image.new('RGB', (1240, 1754), 'white')
+    desenho = ImageDraw.Draw(fundo)
+    for y in range(0, 1754, 40):
+        desenho.rectangle([0, y, 1240, y + 20], fill=(255, 230 - y % 60, 200))
+    fundo.save(os.path.join(pasta, 'assets', 'backgrounds', 'fundo.png'))
+
+    if fonte_ttf and os.path.exists(fonte_ttf):
+        shutil.copy(fonte_ttf, os.path.join(pasta, 'assets', 'fonts', 'Bench.ttf'))
+
+
+def config_variante(tamanho, variante):
+    config = {'tamanho': tamanho}
+    if variante == 'fundo':
+        config['fundo'] = 'fundo.png'
+    elif variante == 'fonte':
+        config.update({'fonte_nome': 'Bench', 'fonte_valor': 'Bench', 'fonte_data': 'Bench'})
+    elif variante == 'imagem_codigo':
+        config['usar_imagem_codigo'] = True
+    return config
+
+
+def pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def executar_caso(caso):
+    """Roda todas as etapas de um caso em uma pasta própria e retorna as medidas"""
+    base = tempfile.mkdtemp(prefix='bench_caso_')
+    try:
+        shutil.copytree(os.path.join(caso['base'], 'assets'), os.path.join(base, 'assets'))
+        arquivo = shutil.copy(caso['arquivo'], base)
+        return medir_caso(dict(caso, base=base, arquivo=arquivo))
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def medir_caso(caso):
+    """Mede as etapas de um caso (leitura, validação, PDF e preview)"""
+    from cache_arquivos import cache_dataframes
+    from gerador_placas import GeradorPlacas
+    from validacao import validar_dataframe
+
+    gerador = GeradorPlacas(caso['base'])
+    config = config_variante(caso['tamanho'], caso['variante'])
+    etapas = {}
+
+    cache_dataframes.invalidar()
+    df, segundos = cronometrar(gerador.ler_arquivo, caso['arquivo'])
+    etapas['ler_arquivo'] = {'segundos': round(segundos, 4), 'linhas_por_s': round(len(df) / segundos, 1)}
+
+    invalidos, segundos = cronometrar(validar_dataframe, df)
+    etapas['validar_dataframe'] = {'segundos': round(segundos, 4), 'linhas_por_s': round(len(df) / segundos, 1)}
+
+    validos = df.drop(df.index[list(invalidos)])
+    # Melhor tempo entre as repetições, para reduzir o ruído
+    segundos = None
+    for _ in range(caso['repeticoes']):
+        pdf = io.BytesIO()
+        _, tempo = cronometrar(gerador.gerar_pdf, validos, pdf, config)
+        segundos = tempo if segundos is None else min(segundos, tempo)
+    etapas['gerar_pdf'] = {
+        'segundos': round(segundos, 4),
+        'placas': len(validos),
+        'placas_por_s': round(len(validos) / segundos, 1),
+        'bytes_pdf': len(pdf.getvalue())
+    }
+
+    amostra = validos.head(caso['previews'])
+    inicio = time.perf_counter()
+    for _, produto in amostra.iterrows():
+        gerador.gerar_preview_placa(produto.to_dict(), config)
+    segundos = time.perf_counter() - inicio
+    etapas['gerar_preview_placa'] = {
+        'segundos': round(segundos, 4),
+        'previews_por_s': round(len(amostra) / segundos, 1) if segundos else None
+    }
+
+    return {
+        'linhas': caso['linhas'],
+        'formato': caso['formato'],
+        'tamanho': caso['tamanho'],
+        'variante': caso['variante'],
+        'etapas': etapas,
+        'pico_rss_mb': pico_rss_mb()
+    }
+
+
+def chave_caso(resultado):
+    return (resultado['linhas'], resultado['formato'], resultado['tamanho'], resultado['variante'])
+
+
+def comparar(atual, anterior):
+    """Imprime a razão de placas/s entre a execução atual e a anterior para os casos em comum"""
+    anteriores = {chave_caso(r): r for r in anterior['resultados']}
+    print(f"\n{'caso':<36} {'antes':>10} {'agora':>10} {'razão':>8}")
+    for resultado in atual['resultados']:
+        antigo = anteriores.get(chave_caso(resultado))
+        if not antigo:
+            continue
+        antes = antigo['etapas']['gerar_pdf']['placas_por_s']
+        agora = resultado['etapas']['gerar_pdf']['placas_por_s']
+        caso = ' '.join(str(parte) for parte in chave_caso(resultado))
+        print(f"{caso:<36} {antes:>10.1f} {agora:>10.1f} {agora / antes:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das etapas do gerador de placas')
+    parser.add_argument('--linhas', type=int, nargs='+', default=[1000])
+    parser.add_argument('--formatos', nargs='+', default=['csv'], choices=['csv', 'xlsx'])
+    parser.add_argument('--tamanhos', nargs='+', default=TAMANHOS, choices=TAMANHOS)
+    parser.add_argument('--variantes', nargs='+', default=VARIANTES, choices=VARIANTES)
+    parser.add_argument('--tamanho-nome', type=int, nargs=2, default=[10, 40], metavar=('MIN', 'MAX'))
+    parser.add_argument('--taxa-invalidos', type=float, default=0.05)
+    parser.add_argument('--taxa-codigo', type=float, default=1.0)
+    parser.add_argument('--previews', type=int, default=20)
+    parser.add_argument('--repeticoes', type=int, default=1)
+    parser.add_argument('--fonte-ttf', default=FONTE_TTF)
+    parser.add_argument('--saida', default='bench_pipeline.json')
+    parser.add_argument('--comparar')
+    args = parser.parse_args()
+
+    base = tempfile.mkdtemp(prefix='bench_placas_')
+    try:
+        preparar_base(base, args.fonte_ttf)
+        variantes = [v for v in args.variantes if v != 'fonte' or os.path.exists(args.fonte_ttf)]
+
+        casos = []
+        for linhas in args.linhas:
+            df = gerar_catalogo(
+                linhas,
+                tamanho_nome=tuple(args.tamanho_nome),
+                taxa_invalidos=args.taxa_invalidos,
+                taxa_codigo=args.taxa_codigo
+            )
+            for formato in args.formatos:
+                arquivo = salvar_catalogo(df, os.path.join(base, f'catalogo_{linhas}.{formato}'))
+                for tamanho in args.tamanhos:
+                    for variante in variantes:
+                        casos.append({
+                            'base': base, 'arquivo': arquivo, 'linhas': linhas, 'formato': formato,
+                            'tamanho': tamanho, 'variante': variante, 'previews': args.previews,
+                            'repeticoes': max(1, args.repeticoes)
+                        })
+
+        resultados = []
+        # Um processo por caso: o pico de RSS de um caso não contamina os outros
+        contexto = multiprocessing.get_context('spawn')
+        with contexto.Pool(processes=1, maxtasksperchild=1) as pool:
+            for resultado in pool.imap(executar_caso, casos):
+                pdf = resultado['etapas']['gerar_pdf']
+                rss = resultado['pico_rss_mb']
+                print(f"{resultado['linhas']:>7} {resultado['formato']:<4} {resultado['tamanho']:<4} "
+                      f"{resultado['variante']:<14} {pdf['placas_por_s']:>8.1f} placas/s "
+                      f"{pdf['bytes_pdf'] / 1024:>9.0f} KB "
+                      f"{'-' if rss is None else f'{rss:.1f}':>7} MB")
+                resultados.append(resultado)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    relatorio = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'reportlab': reportlab.Version
+        },
+        'parametros': {
+            'tamanho_nome': args.tamanho_nome,
+            'taxa_invalidos': args.taxa_invalidos,
+            'taxa_codigo': args.taxa_codigo,
+            'previews': args.previews,
+            'repeticoes': args.repeticoes
+        },
+        'resultados': resultados
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nRelatório gravado em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            comparar(relatorio, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Compara a validação por colunas com o caminho antigo (iterrows + validar_produto)
+
+Uso: python benchmarks/bench_validacao.py [linhas]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gerador_placas import GeradorPlacas
+from validacao import validar_dataframe
+
+from catalogo_sintetico import gerar_catalogo
+
+
+def validar_por_linha(gerador, df):
+    resultado = {}
+    for pos, (_, row) in enumerate(df.iterrows()):
+        problemas = gerador.validar_produto(row.to_dict())
+        if problemas:
+            resultado[pos] = problemas
+    return resultado
+
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+if __name__ == '__main__':
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    # Metade das linhas inválidas, para os dois caminhos passarem por todas as verificações
+    df = gerar_catalogo(linhas, taxa_invalidos=0.5, taxa_codigo=0.8)
+    gerador = GeradorPlacas(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    antigo, t_antigo = cronometrar(validar_por_linha, gerador, df)
+    novo, t_novo = cronometrar(validar_dataframe, df)
+
+    if antigo != novo:
+        print("ERRO: os resultados dos dois caminhos são diferentes")
+        sys.exit(1)
+
+    print(f"Linhas:              {linhas}")
+    print(f"Linhas inválidas:    {len(novo)}")
+    print(f"iterrows (antigo):   {t_antigo:.3f}s")
+    print(f"Por colunas (novo):  {t_novo:.3f}s")
+    print(f"Ganho:               {t_antigo / t_novo:.1f}x")
@@ -0,0 +1,79 @@
+"""Gera catálogos sintéticos (CSV ou XLSX) no formato esperado pelo gerador de placas
+
+Uso: python benchmarks/catalogo_sintetico.py saida.csv|saida.xlsx [linhas]
+"""
+import os
+import random
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codigo_barras import digito_verificador
+
+PALAVRAS = [
+    'Arroz', 'Feijão', 'Carioca', 'Tipo 1', 'Óleo', 'de', 'Soja', 'Açúcar', 'Refinado',
+    'Café', 'Torrado', 'Moído', 'Leite', 'Integral', 'Macarrão', 'Espaguete', 'Biscoito',
+    'Recheado', 'Chocolate', 'Sabão', 'em Pó', 'Detergente', 'Limão', 'Refrigerante',
+    'Cola', 'Suco', 'Uva', 'Integral', 'Queijo', 'Mussarela', 'Fatiado', 'Presunto'
+]
+UNIDADES = ['1kg', '5kg', '500g', '900ml', '2L', '1L', '200g', '12un']
+
+# Valores que a validação rejeita, por coluna; um deles é sorteado para cada linha inválida
+INVALIDOS = {
+    'Nome do produto': ['', None, 'X'],
+    'Preço': ['abc', '', None, '12,5,0'],
+    'Data da Oferta': ['30/02/2024', '2024-01-01', '', None],
+    'Codigo de Barras': ['123', '78912345678AB', '789123456789'],
+}
+
+
+def ean13_aleatorio(rnd):
+    codigo12 = '789' + ''.join(rnd.choice('0123456789') for _ in range(9))
+    return codigo12 + str(digito_verificador(codigo12))
+
+
+def nome_aleatorio(rnd, tamanho_nome):
+    minimo, maximo = tamanho_nome
+    alvo = rnd.randint(minimo, maximo)
+    partes = []
+    while len(' '.join(partes)) < alvo:
+        partes.append(rnd.choice(PALAVRAS))
+    return (' '.join(partes)[:alvo].rstrip() + ' ' + rnd.choice(UNIDADES)).strip()
+
+
+def gerar_catalogo(linhas, tamanho_nome=(10, 40), taxa_invalidos=0.05, taxa_codigo=1.0, semente=42):
+    """Catálogo com nomes de tamanho variável, uma fração de linhas inválidas e códigos opcionais"""
+    rnd = random.Random(semente)
+    registros = []
+    for _ in range(linhas):
+        registro = {
+            'Nome do produto': nome_aleatorio(rnd, tamanho_nome),
+            'Preço': f"{rnd.randint(1, 500)},{rnd.randint(0, 99):02d}",
+            'Data da Oferta': f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2026",
+            'Codigo de Barras': ean13_aleatorio(rnd) if rnd.random() < taxa_codigo else '',
+        }
+        if rnd.random() < taxa_invalidos:
+            campo = rnd.choice(list(INVALIDOS))
+            registro[campo] = rnd.choice(INVALIDOS[campo])
+        registros.append(registro)
+    return pd.DataFrame(registros, columns=list(INVALIDOS))
+
+
+def salvar_catalogo(df, path):
+    """Salva como CSV ou XLSX conforme a extensão"""
+    if path.endswith('.xlsx'):
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False, encoding='utf-8')
+    return path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    linhas = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    salvar_catalogo(gerar_catalogo(linhas), sys.argv[1])
+    print(f"{linhas} linhas gravadas em {sys.argv[1]}")
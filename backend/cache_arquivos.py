@@ -0,0 +1,94 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class CacheArquivos:
+    """Cache LRU de DataFrames já lidos e normalizados, limitado por memória"""
+
+    def __init__(self, limite_bytes=256 * 1024 * 1024, max_itens=32):
+        self.limite_bytes = limite_bytes
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._bytes_usados = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def _chave(self, arquivo_path):
+        # Caminho + mtime + tamanho: um novo upload com o mesmo nome invalida a entrada
+        info = os.stat(arquivo_path)
+        return (os.path.abspath(arquivo_path), info.st_mtime_ns, info.st_size)
+
+    def obter(self, arquivo_path, carregar):
+        """Retorna o DataFrame do arquivo, chamando carregar(arquivo_path) só quando necessário"""
+        chave = self._chave(arquivo_path)
+
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+            self.falhas += 1
+
+        df = carregar(arquivo_path)
+        tamanho = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            # Versões antigas do mesmo arquivo não serão mais usadas
+            for antiga in [c for c in self._itens if c[0] == chave[0] and c != chave]:
+                self._remover(antiga)
+
+            if tamanho <= self.limite_bytes and chave not in self._itens:
+                self._itens[chave] = (df, tamanho)
+                self._bytes_usados += tamanho
+                self._despejar()
+
+        return df
+
+    def existente(self, arquivo_path):
+        """DataFrame do arquivo se já estiver no cache, sem carregá-lo"""
+        chave = self._chave(arquivo_path)
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+        return None
+    
+    def invalidar(self, arquivo_path=None):
+        """Remove do cache um arquivo específico ou tudo"""
+        with self._lock:
+            if arquivo_path is None:
+                self._itens.clear()
+                self._bytes_usados = 0
+                return
+
+            caminho = os.path.abspath(arquivo_path)
+            for chave in [c for c in self._itens if c[0] == caminho]:
+                self._remover(chave)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'itens': len(self._itens),
+                'bytes_usados': self._bytes_usados,
+                'limite_bytes': self.limite_bytes,
+                'acertos': self.acertos,
+                'falhas': self.falhas
+            }
+
+    def _remover(self, chave):
+        _, tamanho = self._itens.pop(chave)
+        self._bytes_usados -= tamanho
+
+    def _despejar(self):
+        # Remove os menos usados recentemente até caber no orçamento
+        while self._itens and (self._bytes_usados > self.limite_bytes or len(self._itens) > self.max_itens):
+            self._remover(next(iter(self._itens)))
+
+
+# Instância compartilhada pelo processo (o gerador é recriado a cada requisição)
+cache_dataframes = CacheArquivos(
+    limite_bytes=int(os.environ.get('PLACAS_CACHE_ARQUIVOS_MB', 256)) * 1024 * 1024
+)
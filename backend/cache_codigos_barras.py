@@ -0,0 +1,145 @@
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from reportlab.lib.utils import ImageReader
+
+from codigo_barras import renderizar_png_ean13, MODULO_PADRAO, ALTURA_PADRAO
+
+
+class CacheCodigosBarras:
+    """Imagens PNG de códigos de barras em dois níveis: memória (LRU) e disco com cota"""
+
+    def __init__(self, pasta, cota_bytes=64 * 1024 * 1024, max_memoria=512):
+        self.pasta = pasta
+        self.cota_bytes = cota_bytes
+        self.max_memoria = max_memoria
+        self._memoria = OrderedDict()  # nome do arquivo -> (png, ImageReader)
+        self._disco = None  # nome do arquivo -> [tamanho, último acesso]
+        self._bytes_disco = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def nome_arquivo(codigo, modulo=MODULO_PADRAO, altura=ALTURA_PADRAO):
+        """Nome do arquivo determinado pelo código e pelos parâmetros de tamanho"""
+        return f"ean13_{codigo}_{modulo}x{altura}.png"
+
+    def _carregar_indice(self):
+        # Índice do disco montado uma vez a partir da pasta existente
+        if self._disco is not None:
+            return
+        self._disco = {}
+        self._bytes_disco = 0
+        os.makedirs(self.pasta, exist_ok=True)
+        entradas = []
+        for nome in os.listdir(self.pasta):
+            if nome.startswith('ean13_') and nome.endswith('.png'):
+                info = os.stat(os.path.join(self.pasta, nome))
+                entradas.append((info.st_mtime, nome, info.st_size))
+        for mtime, nome, tamanho in sorted(entradas):
+            self._disco[nome] = [tamanho, mtime]
+            self._bytes_disco += tamanho
+        self._aplicar_cota()
+
+    def _aplicar_cota(self, preservar=None):
+        if self._bytes_disco <= self.cota_bytes:
+            return
+        # Remove os arquivos acessados há mais tempo até caber na cota
+        for nome, (tamanho, _) in sorted(self._disco.items(), key=lambda item: item[1][1]):
+            if self._bytes_disco <= self.cota_bytes:
+                break
+            if nome == preservar:
+                continue
+            try:
+                os.remove(os.path.join(self.pasta, nome))
+            except OSError:
+                pass
+            del self._disco[nome]
+            self._memoria.pop(nome, None)
+            self._bytes_disco -= tamanho
+
+    def _guardar_memoria(self, nome, png):
+        imagem = ImageReader(io.BytesIO(png))
+        imagem.getRGBData()  # decodifica uma vez, antes de compartilhar entre threads
+        self._memoria[nome] = (png, imagem)
+        while len(self._memoria) > self.max_memoria:
+            self._memoria.popitem(last=False)
+        return self._memoria[nome]
+
+    def _obter(self, codigo, modulo, altura):
+        nome = self.nome_arquivo(codigo, modulo, altura)
+        with self._lock:
+            self._carregar_indice()
+
+            if nome in self._memoria and nome in self._disco:
+                self._memoria.move_to_end(nome)
+                self._disco[nome][1] = time.time()
+                return nome, self._memoria[nome]
+
+            path = os.path.join(self.pasta, nome)
+            png = self._memoria[nome][0] if nome in self._memoria else None
+            if png is None and nome in self._disco:
+                try:
+                    with open(path, 'rb') as f:
+                        png = f.read()
+                    self._disco[nome][1] = time.time()
+                except OSError:
+                    # Removido por outro processo: renderiza de novo
+                    self._bytes_disco -= self._disco.pop(nome)[0]
+
+            if png is None:
+                png = renderizar_png_ean13(codigo, modulo, altura)
+            if nome not in self._disco:
+                with open(path, 'wb') as f:
+                    f.write(png)
+                self._disco[nome] = [len(png), time.time()]
+                self._bytes_disco += len(png)
+
+            entrada = self._guardar_memoria(nome, png)
+            self._aplicar_cota(preservar=nome)
+            return nome, entrada
+
+    def arquivo(self, codigo, modulo=MODULO_PADRAO, altura=ALTURA_PADRAO):
+        """Garante a imagem em disco e retorna o nome do arquivo"""
+        nome, _ = self._obter(codigo, modulo, altura)
+        return nome
+
+    def imagem(self, codigo, modulo=MODULO_PADRAO, altura=ALTURA_PADRAO):
+        """Retorna um ImageReader já decodificado, sem ler o disco quando está em memória"""
+        _, (_, imagem) = self._obter(codigo, modulo, altura)
+        return imagem
+
+    def existe(self, codigo, modulo=MODULO_PADRAO, altura=ALTURA_PADRAO):
+        """Consulta o índice sem renderizar"""
+        nome = self.nome_arquivo(codigo, modulo, altura)
+        with self._lock:
+            self._carregar_indice()
+            return nome in self._memoria or nome in self._disco
+
+    def estatisticas(self):
+        with self._lock:
+            self._carregar_indice()
+            return {
+                'memoria_itens': len(self._memoria),
+                'disco_itens': len(self._disco),
+                'disco_bytes': self._bytes_disco,
+                'cota_bytes': self.cota_bytes
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_codigos_barras(pasta):
+    """Retorna o cache compartilhado da pasta de códigos de barras"""
+    pasta = os.path.abspath(pasta)
+    with _caches_lock:
+        if pasta not in _caches:
+            _caches[pasta] = CacheCodigosBarras(
+                pasta,
+                cota_bytes=int(os.environ.get('PLACAS_COTA_CODIGOS_MB', 64)) * 1024 * 1024
+            )
+        return _caches[pasta]
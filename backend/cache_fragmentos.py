@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import reportlab
+
+from metricas import metricas
+
+# Mudar quando o formato dos fragmentos mudar: os fragmentos antigos deixam de ser encontrados
+VERSAO_FRAGMENTOS = 2
+
+# Módulos que desenham as placas: alterar qualquer um deles também invalida os fragmentos
+_CODIGO_DESENHO = ('gerador_placas.py', 'medidas_texto.py', 'codigo_barras.py', 'cache_fragmentos.py')
+
+# Seleção de fonte dentro do fragmento ("/F3 12 Tf"): o nome interno depende do documento
+_FONTE = re.compile(r'/(F\d+) (?=[\d.]+ Tf)')
+_MARCADOR = re.compile('\x00(\\d+)\x00')
+
+
+def _versao_desenho():
+    """Hash da versão dos fragmentos, do reportlab e do código de desenho"""
+    digest = hashlib.sha256(f"{VERSAO_FRAGMENTOS}:{reportlab.Version}".encode('utf-8'))
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    for arquivo in _CODIGO_DESENHO:
+        with open(os.path.join(pasta, arquivo), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+VERSAO_DESENHO = _versao_desenho()
+
+
+def capturar(canvas_obj, desenhar):
+    """Executa desenhar() e devolve os operadores gerados, independentes do documento, ou None se não der"""
+    inicio = len(canvas_obj._code)
+    inicio_forms = len(canvas_obj._formsinuse)
+    desenhar()
+    codigo = '\n'.join(canvas_obj._code[inicio:])
+
+    internas = {interna[1:]: nome for nome, interna in canvas_obj._doc.fontMapping.items()}
+    fontes = []
+
+    def marcar(m):
+        fontes.append(internas[m.group(1)])
+        return f"\x00{len(fontes) - 1}\x00 "
+
+    # Fontes TTF são gravadas em subconjuntos montados por documento ("/F2+0"): essas placas não são guardadas
+    if re.search(r'/F\d+\+\d+ ', codigo):
+        return None
+    try:
+        codigo = _FONTE.sub(marcar, codigo)
+    except KeyError:
+        return None
+    return {'codigo': codigo, 'fontes': fontes, 'forms': list(canvas_obj._formsinuse[inicio_forms:])}
+
+
+def reproduzir(canvas_obj, fragmento):
+    """Acrescenta o fragmento à página atual; False se ele usa forms/imagens que este documento ainda não tem"""
+    if not all(canvas_obj.hasForm(nome) for nome in fragmento['forms']):
+        return False
+    fontes = fragmento['fontes']
+    canvas_obj._code.append(_MARCADOR.sub(
+        lambda m: canvas_obj._doc.getInternalFontName(fontes[int(m.group(1))]), fragmento['codigo']
+    ))
+    if fragmento['forms']:
+        canvas_obj._formsinuse.extend(fragmento['forms'])
+        canvas_obj._currentPageHasImages = 1
+    return True
+
+
+class CacheFragmentos:
+    """Placas já desenhadas, guardadas como operadores PDF e reaproveitadas entre execuções, lojas e dias"""
+
+    def __init__(self, db_path, limite_disco_bytes=256 * 1024 * 1024, limite_memoria_bytes=32 * 1024 * 1024):
+        self.db_path = db_path
+        self.limite_disco_bytes = limite_disco_bytes
+        self.limite_memoria_bytes = limite_memoria_bytes
+        self._memoria = OrderedDict()  # chave -> (fragmento, tamanho)
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        with self._conectar() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fragmentos (
+                    chave TEXT PRIMARY KEY,
+                    dados BLOB NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    acesso REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_fragmentos_acesso ON fragmentos (acesso)')
+
+    def _conectar(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def sessao(self, chave_layout, recursos=None):
+        """Sessão usada durante a geração de um PDF (uma thread); recursos descreve fontes e fundo em uso"""
+        return SessaoFragmentos(self, chave_layout, recursos)
+
+    def _memoria_obter(self, chave):
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item is None:
+                return None
+            self._memoria.move_to_end(chave)
+            return item[0]
+
+    def _memoria_guardar(self, chave, fragmento, tamanho):
+        with self._lock:
+            if chave in self._memoria:
+                return
+            self._memoria[chave] = (fragmento, tamanho)
+            self._bytes_memoria += tamanho
+            while self._bytes_memoria > self.limite_memoria_bytes and len(self._memoria) > 1:
+                _, (_, antigo) = self._memoria.popitem(last=False)
+                self._bytes_memoria -= antigo
+
+    def _limpar_disco(self, conn):
+        """Remove os fragmentos usados há mais tempo até o banco caber no limite"""
+        total = conn.execute('SELECT COALESCE(SUM(tamanho), 0) FROM fragmentos').fetchone()[0]
+        if total <= self.limite_disco_bytes:
+            return
+        # Libera um pouco além do limite para não limpar de novo a cada execução
+        excesso = total - int(self.limite_disco_bytes * 0.9)
+        remover = []
+        for chave, tamanho in conn.execute('SELECT chave, tamanho FROM fragmentos ORDER BY acesso'):
+            remover.append((chave,))
+            excesso -= tamanho
+            if excesso <= 0:
+                break
+        conn.executemany('DELETE FROM fragmentos WHERE chave = ?', remover)
+
+    def estatisticas(self):
+        with self._conectar() as conn:
+            itens, tamanho = conn.execute('SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM fragmentos').fetchone()
+        with self._lock:
+            return {
+                'itens_disco': itens,
+                'bytes_disco': tamanho,
+                'itens_memoria': len(self._memoria),
+                'bytes_memoria': self._bytes_memoria
+            }
+
+
+class SessaoFragmentos:
+    """Busca e captura fragmentos durante um PDF; o que for novo é gravado em disco de uma vez no final"""
+
+    def __init__(self, cache, chave_layout, recursos=None):
+        self.cache = cache
+        self.chave_layout = chave_layout
+        # Tudo o que não depende do produto entra na chave uma vez por sessão
+        self._prefixo = json.dumps([VERSAO_DESENHO, chave_layout, recursos], ensure_ascii=False)
+        self._conn = None
+        self._novos = {}
+        self._usados = set()
+        self.acertos = 0
+        self.falhas = 0
+
+    def chave(self, produto):
+        campos = [str(produto.get(campo, '')) for campo in ('Nome do produto', 'Preço', 'Data da Oferta', 'Codigo de Barras')]
+        texto = self._prefixo + json.dumps(campos, ensure_ascii=False)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:32]
+
+    def _obter(self, chave):
+        fragmento = self._novos.get(chave) or self.cache._memoria_obter(chave)
+        if fragmento is not None:
+            return fragmento
+        if self._conn is None:
+            self._conn = self.cache._conectar()
+        row = self._conn.execute('SELECT dados FROM fragmentos WHERE chave = ?', (chave,)).fetchone()
+        if row is None:
+            return None
+        fragmento = json.loads(zlib.decompress(row[0]))
+        self.cache._memoria_guardar(chave, fragmento, len(fragmento['codigo']))
+        return fragmento
+
+    def desenhar(self, canvas_obj, produto, desenhar):
+        """Desenha a placa na origem atual: do cache se possível, senão com desenhar() e guarda o resultado"""
+        chave = self.chave(produto)
+        fragmento = self._obter(chave)
+        if fragmento is not None and reproduzir(canvas_obj, fragmento):
+            self.acertos += 1
+            self._usados.add(chave)
+        else:
+            self.falhas += 1
+            fragmento = capturar(canvas_obj, desenhar)
+            if fragmento is not None:
+                self._novos[chave] = fragmento
+
+    def concluir(self):
+        """Grava os fragmentos novos, atualiza o último acesso dos usados e respeita o limite do disco"""
+        metricas.contar('placas_fragmentos_total', self.acertos, resultado='acerto')
+        metricas.contar('placas_fragmentos_total', self.falhas, resultado='falha')
+        if not self._novos and not self._usados:
+            return
+        agora = time.time()
+        conn = self._conn or self.cache._conectar()
+        self._conn = None
+        try:
+            with conn:
+                linhas = []
+                for chave, fragmento in self._novos.items():
+                    dados = zlib.compress(json.dumps(fragmento).encode('utf-8'), 1)
+                    linhas.append((chave, dados, len(dados), agora))
+                    self.cache._memoria_guardar(chave, fragmento, len(fragmento['codigo']))
+                conn.executemany('INSERT OR REPLACE INTO fragmentos VALUES (?, ?, ?, ?)', linhas)
+                conn.executemany(
+                    'UPDATE fragmentos SET acesso = ? WHERE chave = ?',
+                    [(agora, chave) for chave in self._usados - set(self._novos)]
+                )
+                if linhas:
+                    self.cache._limpar_disco(conn)
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar cache de fragmentos: {e}")
+        finally:
+            conn.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_fragmentos(base_path):
+    """Cache compartilhado da pasta base, ou None se desativado (PLACAS_CACHE_FRAGMENTOS_MB=0)"""
+    limite_mb = int(os.environ.get('PLACAS_CACHE_FRAGMENTOS_MB', 256))
+    if limite_mb <= 0:
+        return None
+    base_path = os.path.abspath(base_path)
+    with _caches_lock:
+        if base_path not in _caches:
+            cache = CacheFragmentos(
+                os.path.join(base_path, 'fragmentos.db'),
+                limite_disco_bytes=limite_mb * 1024 * 1024,
+                limite_memoria_bytes=int(os.environ.get('PLACAS_CACHE_FRAGMENTOS_MEMORIA_MB', 32)) * 1024 * 1024
+            )
+            _caches[base_path] = cache
+            # O cache é opcional: a métrica só aparece depois que uma geração o usa pela primeira vez
+            metricas.medidor(
+                'placas_cache_fragmentos',
+                lambda: {(('medida', chave),): valor for chave, valor in cache.estatisticas().items()},
+                'Itens e bytes do cache de fragmentos de placas, em disco e em memória'
+            )
+        return _caches[base_path]
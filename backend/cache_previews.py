@@ -0,0 +1,91 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class CachePreviews:
+    """Previews PNG endereçados pelo conteúdo: LRU em memória e cópias em disco limitadas"""
+
+    def __init__(self, pasta, limite_memoria_bytes=32 * 1024 * 1024, max_arquivos_disco=500):
+        self.pasta = pasta
+        self.limite_memoria_bytes = limite_memoria_bytes
+        self.max_arquivos_disco = max_arquivos_disco
+        self._memoria = OrderedDict()  # nome do arquivo -> bytes do PNG
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+
+    def obter(self, nome):
+        """Retorna os bytes do preview (memória, depois disco) ou None"""
+        with self._lock:
+            if nome in self._memoria:
+                self._memoria.move_to_end(nome)
+                return self._memoria[nome]
+
+        path = os.path.join(self.pasta, nome)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+        except OSError:
+            return None
+
+        with self._lock:
+            self._guardar_memoria(nome, png)
+        return png
+
+    def guardar(self, nome, png):
+        """Guarda o preview em memória e em disco, removendo as cópias mais antigas do disco"""
+        with self._lock:
+            self._guardar_memoria(nome, png)
+
+        path = os.path.join(self.pasta, nome)
+        temporario = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporario, 'wb') as f:
+            f.write(png)
+        os.replace(temporario, path)
+        self._limpar_disco()
+
+    def _guardar_memoria(self, nome, png):
+        if nome in self._memoria:
+            self._memoria.move_to_end(nome)
+            return
+        self._memoria[nome] = png
+        self._bytes_memoria += len(png)
+        while self._bytes_memoria > self.limite_memoria_bytes and len(self._memoria) > 1:
+            _, antigo = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(antigo)
+
+    def _limpar_disco(self):
+        arquivos = []
+        for nome in os.listdir(self.pasta):
+            if nome.startswith('preview_') and nome.endswith('.png'):
+                try:
+                    arquivos.append((os.path.getmtime(os.path.join(self.pasta, nome)), nome))
+                except OSError:
+                    pass
+
+        excesso = len(arquivos) - self.max_arquivos_disco
+        if excesso <= 0:
+            return
+        for _, nome in sorted(arquivos)[:excesso]:
+            try:
+                os.remove(os.path.join(self.pasta, nome))
+            except OSError:
+                pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_previews(pasta):
+    """Retorna o cache compartilhado da pasta de previews"""
+    pasta = os.path.abspath(pasta)
+    with _caches_lock:
+        if pasta not in _caches:
+            _caches[pasta] = CachePreviews(
+                pasta,
+                limite_memoria_bytes=int(os.environ.get('PLACAS_CACHE_PREVIEWS_MB', 32)) * 1024 * 1024,
+                max_arquivos_disco=int(os.environ.get('PLACAS_MAX_PREVIEWS_DISCO', 500))
+            )
+        return _caches[pasta]
@@ -0,0 +1,99 @@
+import io
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+# Padrões de 7 módulos por dígito (1 = barra, 0 = espaço)
+_PADROES_L = ['0001101', '0011001', '0010011', '0111101', '0100011',
+              '0110001', '0101111', '0111011', '0110111', '0001011']
+_PADROES_G = [p[::-1].translate(str.maketrans('01', '10')) for p in _PADROES_L]
+_PADROES_R = [p.translate(str.maketrans('01', '10')) for p in _PADROES_L]
+
+# Paridade (L/G) dos 6 dígitos da esquerda, definida pelo primeiro dígito
+_PARIDADES = ['LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG',
+              'LGGLLG', 'LGGGLL', 'LGLGLG', 'LGLGGL', 'LGGLGL']
+
+GUARDA_LATERAL = '101'
+GUARDA_CENTRAL = '01010'
+
+MODULOS = 95
+ZONA_QUIETA_ESQUERDA = 11
+ZONA_QUIETA_DIREITA = 7
+MODULOS_TOTAL = ZONA_QUIETA_ESQUERDA + MODULOS + ZONA_QUIETA_DIREITA
+
+# Tamanho padrão da imagem PNG: pixels por módulo e altura em pixels
+MODULO_PADRAO = 2
+ALTURA_PADRAO = 80
+
+# Módulos das barras de guarda (que descem abaixo das barras de dados)
+_GUARDAS = set(range(0, 3)) | set(range(45, 50)) | set(range(92, 95))
+
+
+def digito_verificador(codigo12):
+    """Calcula o dígito verificador EAN-13 a partir dos 12 primeiros dígitos"""
+    soma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(codigo12))
+    return (10 - soma % 10) % 10
+
+
+def ean13_valido(codigo):
+    """Confere se o código tem 13 dígitos e o dígito verificador correto"""
+    codigo = str(codigo)
+    return (
+        len(codigo) == 13
+        and codigo.isdigit()
+        and codigo.isascii()
+        and digito_verificador(codigo[:12]) == int(codigo[12])
+    )
+
+
+@lru_cache(maxsize=4096)
+def codificar_ean13(codigo):
+    """Retorna a sequência de 95 módulos ('0'/'1') do código EAN-13"""
+    if not ean13_valido(codigo):
+        raise ValueError(f"Código EAN-13 inválido: {codigo}")
+
+    paridade = _PARIDADES[int(codigo[0])]
+    esquerda = ''.join(
+        (_PADROES_L if p == 'L' else _PADROES_G)[int(d)] for d, p in zip(codigo[1:7], paridade)
+    )
+    direita = ''.join(_PADROES_R[int(d)] for d in codigo[7:])
+    return GUARDA_LATERAL + esquerda + GUARDA_CENTRAL + direita + GUARDA_LATERAL
+
+
+@lru_cache(maxsize=4096)
+def barras_ean13(codigo):
+    """Retorna as barras como sequências contínuas (inicio, largura, guarda), em módulos"""
+    modulos = codificar_ean13(codigo)
+    barras = []
+    inicio = None
+    for i, modulo in enumerate(modulos + '0'):
+        if modulo == '1' and inicio is None:
+            inicio = i
+        elif modulo == '0' and inicio is not None:
+            barras.append((inicio, i - inicio, inicio in _GUARDAS))
+            inicio = None
+    return tuple(barras)
+
+
+def renderizar_png_ean13(codigo, modulo=MODULO_PADRAO, altura=ALTURA_PADRAO):
+    """Desenha o código de barras com PIL e retorna os bytes do PNG"""
+    largura = MODULOS_TOTAL * modulo
+    margem = 10
+
+    img = Image.new('RGB', (largura, altura), 'white')
+    draw = ImageDraw.Draw(img)
+
+    # Cada sequência de barras vira um único retângulo
+    base_dados = altura - 25
+    base_guarda = altura - 20
+    for inicio, largura_barra, guarda in barras_ean13(codigo):
+        x0 = (ZONA_QUIETA_ESQUERDA + inicio) * modulo
+        x1 = x0 + largura_barra * modulo - 1
+        draw.rectangle([x0, margem, x1, base_guarda if guarda else base_dados], fill='black')
+
+    # Texto do código
+    draw.text((ZONA_QUIETA_ESQUERDA * modulo, altura - 15), codigo, fill='black')
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
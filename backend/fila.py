@@ -0,0 +1,28 @@
+"""Processo dedicado da fila de trabalhos
+
+Com o gunicorn, o master inicia este processo (gunicorn.conf.py) e os processos que atendem as
+requisições só enfileiram: os PDFs grandes não disputam CPU com os endpoints leves.
+Também pode rodar como serviço separado: PLACAS_FILA=0 no servidor e python fila.py.
+"""
+import os
+import signal
+import threading
+
+os.environ['PLACAS_FILA'] = '1'
+
+from app import fila_trabalhos, encerrar
+
+
+def main():
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+
+    fila_trabalhos.iniciar()
+    print(f"Fila de trabalhos iniciada (pid {os.getpid()})")
+    parar.wait()
+    encerrar(timeout=int(os.environ.get('PLACAS_GRACEFUL_TIMEOUT', 60)))
+
+
+if __name__ == '__main__':
+    main()
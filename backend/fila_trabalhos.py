@@ -0,0 +1,219 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class TrabalhoCancelado(Exception):
+    """Levantada dentro do trabalho quando o cancelamento é solicitado"""
+
+
+class FilaTrabalhos:
+    """Fila de geração de PDFs em segundo plano, com estado persistido em SQLite"""
+
+    INTERVALO_PROGRESSO = 0.5  # segundos entre gravações de progresso
+
+    def __init__(self, db_path, executar, workers=2, recuperar=True):
+        # executar(trabalho_id, parametros, progresso) -> (arquivo_saida, relatorio)
+        self.db_path = db_path
+        self.executar = executar
+        self.workers = workers
+        self._novo_trabalho = threading.Event()
+        self._parar = threading.Event()
+        self._threads = []
+        self._criar_tabela()
+        if recuperar:
+            self.recuperar_interrompidos()
+
+    @contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _criar_tabela(self):
+        with self._conectar() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS trabalhos (
+                    id TEXT PRIMARY KEY,
+                    loja TEXT,
+                    estado TEXT NOT NULL,
+                    parametros TEXT NOT NULL,
+                    renderizados INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    cancelar INTEGER NOT NULL DEFAULT 0,
+                    arquivo TEXT,
+                    relatorio TEXT,
+                    erro TEXT,
+                    criado_em TEXT NOT NULL,
+                    atualizado_em TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_trabalhos_estado ON trabalhos (estado, criado_em)')
+
+    def recuperar_interrompidos(self):
+        # Trabalhos que estavam rodando quando o servidor caiu voltam para a fila
+        with self._conectar() as conn:
+            conn.execute(
+                "UPDATE trabalhos SET estado = 'pendente', renderizados = 0, atualizado_em = ? "
+                "WHERE estado = 'executando'",
+                (datetime.now().isoformat(),)
+            )
+
+    def iniciar(self):
+        """Inicia as threads de trabalho (uma única vez)"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f'trabalhos-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def parar(self, timeout=None):
+        """Não pega novos trabalhos e espera os em andamento (timeout vale para todas as threads juntas)"""
+        self._parar.set()
+        self._novo_trabalho.set()
+        limite = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if limite is None else max(0, limite - time.monotonic()))
+
+    def enviar(self, parametros, loja=None):
+        """Coloca um trabalho na fila e retorna seu id"""
+        trabalho_id = uuid.uuid4().hex
+        agora = datetime.now().isoformat()
+        with self._conectar() as conn:
+            conn.execute(
+                'INSERT INTO trabalhos (id, loja, estado, parametros, criado_em, atualizado_em) '
+                "VALUES (?, ?, 'pendente', ?, ?, ?)",
+                (trabalho_id, loja, json.dumps(parametros, ensure_ascii=False), agora, agora)
+            )
+        self._novo_trabalho.set()
+        return trabalho_id
+
+    def status(self, trabalho_id):
+        """Retorna o estado do trabalho ou None se não existir"""
+        with self._conectar() as conn:
+            row = conn.execute('SELECT * FROM trabalhos WHERE id = ?', (trabalho_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'loja': row['loja'],
+            'estado': row['estado'],
+            'renderizados': row['renderizados'],
+            'total': row['total'],
+            'arquivo': os.path.basename(row['arquivo']) if row['arquivo'] else None,
+            'relatorio': json.loads(row['relatorio']) if row['relatorio'] else None,
+            'erro': row['erro'],
+            'criado_em': row['criado_em'],
+            'atualizado_em': row['atualizado_em']
+        }
+
+    def contagem_por_estado(self):
+        """Quantidade de trabalhos em cada estado"""
+        with self._conectar() as conn:
+            rows = conn.execute('SELECT estado, COUNT(*) AS n FROM trabalhos GROUP BY estado').fetchall()
+        return {row['estado']: row['n'] for row in rows}
+
+    def caminho_resultado(self, trabalho_id):
+        with self._conectar() as conn:
+            row = conn.execute(
+                "SELECT arquivo FROM trabalhos WHERE id = ? AND estado = 'concluido'", (trabalho_id,)
+            ).fetchone()
+        return row['arquivo'] if row else None
+
+    def cancelar(self, trabalho_id):
+        """Cancela um trabalho pendente ou pede a parada de um em execução"""
+        agora = datetime.now().isoformat()
+        with self._conectar() as conn:
+            cursor = conn.execute(
+                "UPDATE trabalhos SET cancelar = 1, atualizado_em = ? WHERE id = ? AND estado IN ('pendente', 'executando')",
+                (agora, trabalho_id)
+            )
+            conn.execute("UPDATE trabalhos SET estado = 'cancelado' WHERE id = ? AND estado = 'pendente'", (trabalho_id,))
+        return cursor.rowcount > 0
+
+    def _reservar_proximo(self):
+        """Marca o próximo trabalho como em execução, priorizando lojas com menos trabalhos rodando"""
+        with self._conectar() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('''
+                    SELECT id, parametros FROM trabalhos t
+                    WHERE estado = 'pendente'
+                    ORDER BY (
+                        SELECT COUNT(*) FROM trabalhos e
+                        WHERE e.estado = 'executando' AND e.loja IS t.loja
+                    ), criado_em
+                    LIMIT 1
+                ''').fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE trabalhos SET estado = 'executando', atualizado_em = ? WHERE id = ?",
+                        (datetime.now().isoformat(), row['id'])
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return row
+
+    def _loop(self):
+        while not self._parar.is_set():
+            row = self._reservar_proximo()
+            if row is None:
+                # Sem trabalho: espera um envio (ou reconsulta, caso outro processo tenha enviado)
+                self._novo_trabalho.wait(2)
+                self._novo_trabalho.clear()
+                continue
+            self._executar(row['id'], json.loads(row['parametros']))
+
+    def _executar(self, trabalho_id, parametros):
+        ultima_gravacao = [0.0]
+
+        def progresso(renderizados, total):
+            # total é None quando o arquivo é lido em blocos e o tamanho ainda não é conhecido
+            agora = time.monotonic()
+            if (total is None or renderizados < total) and agora - ultima_gravacao[0] < self.INTERVALO_PROGRESSO:
+                return
+            ultima_gravacao[0] = agora
+            with self._conectar() as conn:
+                conn.execute(
+                    'UPDATE trabalhos SET renderizados = ?, total = ?, atualizado_em = ? WHERE id = ?',
+                    (renderizados, total or 0, datetime.now().isoformat(), trabalho_id)
+                )
+                cancelar = conn.execute('SELECT cancelar FROM trabalhos WHERE id = ?', (trabalho_id,)).fetchone()
+            if cancelar and cancelar['cancelar']:
+                raise TrabalhoCancelado()
+
+        try:
+            arquivo, relatorio = self.executar(trabalho_id, parametros, progresso)
+            self._finalizar(trabalho_id, 'concluido', arquivo=arquivo, relatorio=relatorio)
+        except TrabalhoCancelado:
+            self._finalizar(trabalho_id, 'cancelado')
+        except Exception as e:
+            traceback.print_exc()
+            self._finalizar(trabalho_id, 'erro', erro=str(e))
+
+    def _finalizar(self, trabalho_id, estado, arquivo=None, relatorio=None, erro=None):
+        with self._conectar() as conn:
+            conn.execute(
+                'UPDATE trabalhos SET estado = ?, arquivo = ?, relatorio = ?, erro = ?, atualizado_em = ? WHERE id = ?',
+                (
+                    estado,
+                    arquivo,
+                    json.dumps(relatorio, ensure_ascii=False, default=str) if relatorio is not None else None,
+                    erro,
+                    datetime.now().isoformat(),
+                    trabalho_id
+                )
+            )
@@ -1,46 +1,245 @@
 import pandas as pd
+import numpy as np
 import os
+import openpyxl
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A3, A4, A5, mm
-from reportlab.lib.utils import ImageReader
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.colors import HexColor
+from reportlab import rl_config
 from PIL import Image, ImageDraw
 from datetime import datetime
 import json
+import io
+import hashlib
 import textwrap
 import re
 import math
+import time
+from cache_arquivos import cache_dataframes
+from indice_linhas import cache_indices, tipos_combinados
+from armazem_colunar import armazem_colunar
+from manifesto_execucoes import RepositorioManifestos, ExecucaoDelta
+from validacao import validar_dataframe, coluna
+from codigo_barras import ean13_valido, barras_ean13, MODULOS_TOTAL, ZONA_QUIETA_ESQUERDA
+from cache_codigos_barras import cache_codigos_barras
+from cache_previews import cache_previews
+from cache_fragmentos import cache_fragmentos
+from recursos import registro_recursos, FONTES_PADRAO
+from medidas_texto import medidor_texto
+from metricas import metricas
+from plano_layout import PlanoLayout, EstiloElemento, cor_rgb, chave_config, chave_layout, cache_planos
+from imposicao import imposicao, TAMANHOS, PLACA_REFERENCIA
+from renderizacao_paralela import gerar_pdf_paralelo, miniaturas_paralelas, WORKERS_RENDERIZACAO
+import preview_raster
+from preview_raster import DPI_PREVIEW, DPI_MINIATURA
+
+# Linhas por bloco na leitura em blocos
+TAMANHO_BLOCO = 5000
+
+# Arquivos maiores que isso são lidos, validados e desenhados bloco a bloco
+LIMITE_LEITURA_EM_BLOCOS = int(os.environ.get('PLACAS_LIMITE_BLOCOS_MB', 16)) * 1024 * 1024
+
+# Campos do produto usados nas placas
+CAMPOS_PRODUTO = ['Nome do produto', 'Preço', 'Data da Oferta', 'Codigo de Barras']
+
+# Imagens gravadas em binário: a codificação ASCII85 em Python puro custava ~1s por fundo em cada PDF
+rl_config.useA85 = 0
+
+# Partes fixas dos textos da placa
+ROTULO_DATA = 'Válido até: '
+ROTULO_CODIGO = 'Cód: '
 
 class GeradorPlacas:
     def __init__(self, base_path):
         self.base_path = base_path
-        # Definir tamanhos customizados
-        self.pagesizes = {
-            'A3': A3,
-            'A3+': (329 * mm, 483 * mm),
-            'A4': A4,
-            'A5': (A4[1]/2, A4[0]/2),  # A5 landscape em A4
-            'A6': (A4[0]/2, A4[1]/4)   # A6 - 4 por folha A4
-        }
         
         self.previews_folder = os.path.join(base_path, 'previews')
         self.barcodes_folder = os.path.join(base_path, 'barcodes')
         os.makedirs(self.previews_folder, exist_ok=True)
         os.makedirs(self.barcodes_folder, exist_ok=True)
+        self.manifestos = RepositorioManifestos(os.path.join(base_path, 'manifestos'))
+    
+    def aquecer(self):
+        """Carrega fontes, fundos, métricas de texto e planos de página antes dos primeiros pedidos"""
+        inicio = time.perf_counter()
+        
+        fontes = list(FONTES_PADRAO)
+        pasta_fontes = os.path.join(self.base_path, 'assets', 'fonts')
+        if os.path.isdir(pasta_fontes):
+            for arquivo in sorted(os.listdir(pasta_fontes)):
+                if arquivo.lower().endswith('.ttf') and registro_recursos.fonte(self.base_path, arquivo[:-4]):
+                    fontes.append(arquivo[:-4])
+        for fonte in fontes:
+            medidor_texto.aquecer(fonte)
+        
+        fundos = 0
+        pasta_fundos = os.path.join(self.base_path, 'assets', 'backgrounds')
+        if os.path.isdir(pasta_fundos):
+            for arquivo in sorted(os.listdir(pasta_fundos)):
+                if arquivo.lower().endswith(('.png', '.jpg', '.jpeg')):
+                    try:
+                        if registro_recursos.fundo(self.base_path, arquivo):
+                            fundos += 1
+                    except Exception as e:
+                        print(f"Erro ao carregar fundo {arquivo}: {e}")
+        
+        for tamanho in TAMANHOS:
+            self.plano_layout({'tamanho': tamanho})
+        
+        # Uma placa de teste carrega os módulos do ReportLab usados só na hora de desenhar
+        produto = pd.DataFrame([{
+            'Nome do produto': 'Aquecimento',
+            'Preço': '1,00',
+            'Data da Oferta': '01/01/2026',
+            'Codigo de Barras': '7891234567895'
+        }])
+        self.gerar_pdf(produto, io.BytesIO(), {'tamanho': 'A6'})
+        
+        return {
+            'fontes': len(fontes),
+            'fundos': fundos,
+            'tamanhos': len(TAMANHOS),
+            'segundos': round(time.perf_counter() - inicio, 3)
+        }
     
     def ler_arquivo(self, arquivo_path):
+        """Lê arquivo CSV ou Excel usando o cache de arquivos já processados"""
+        df = cache_dataframes.obter(arquivo_path, self._ler_arquivo_sem_cache)
+        # Cópia rasa para que alterações de colunas não afetem a entrada do cache
+        return df.copy(deep=False)
+    
+    def _ler_arquivo_sem_cache(self, arquivo_path):
         """Lê arquivo CSV ou Excel com tratamento para diferentes formatos de coluna"""
+        with metricas.cronometrar('placas_etapa_segundos', etapa='leitura'):
+            # Upload já convertido para Arrow: nada de reinterpretar o CSV/XLSX
+            df = armazem_colunar.ler(arquivo_path)
+            if df is not None:
+                metricas.contar('placas_etapa_total', len(df), etapa='leitura')
+                return df
+            
+            if arquivo_path.endswith('.csv'):
+                df = pd.read_csv(arquivo_path, encoding='utf-8')
+            elif arquivo_path.endswith(('.xlsx', '.xls')):
+                df = pd.read_excel(arquivo_path)
+            else:
+                raise ValueError("Formato não suportado")
+            
+            df = self.normalizar_colunas(df)
+        metricas.contar('placas_etapa_total', len(df), etapa='leitura')
+        # Já que o arquivo foi lido inteiro, as próximas leituras (em qualquer processo) usam a cópia em Arrow;
+        # sem ela, as seleções de um CSV ainda podem ler só as suas linhas
+        if not armazem_colunar.converter(arquivo_path, df) and arquivo_path.endswith('.csv'):
+            cache_indices.guardar(arquivo_path, df.columns, df.dtypes)
+        return df
+    
+    def ler_linhas(self, arquivo_path, posicoes):
+        """Equivale a ler_arquivo(arquivo_path).iloc[posicoes], lendo do CSV só as linhas pedidas quando possível"""
+        df = cache_dataframes.existente(arquivo_path)
+        if df is None:
+            with metricas.cronometrar('placas_etapa_segundos', etapa='leitura'):
+                df = armazem_colunar.ler_linhas(arquivo_path, posicoes)
+                if df is None and arquivo_path.endswith('.csv'):
+                    indice = cache_indices.obter(arquivo_path)
+                    if indice is not None:
+                        df = indice.ler(arquivo_path, posicoes)
+            if df is not None:
+                metricas.contar('placas_etapa_total', len(df), etapa='leitura')
+                return df
+        if df is None:
+            df = self.ler_arquivo(arquivo_path)
+        return df.iloc[posicoes]
+    
+    def total_linhas(self, arquivo_path):
+        """Quantidade de produtos do arquivo, pelo índice de linhas quando existe"""
+        if cache_dataframes.existente(arquivo_path) is None:
+            total = armazem_colunar.total(arquivo_path)
+            if total is not None:
+                return total
+            indice = cache_indices.obter(arquivo_path) if arquivo_path.endswith('.csv') else None
+            if indice is not None:
+                return indice.total
+        return len(self.ler_arquivo(arquivo_path))
+    
+    def ler_arquivo_em_blocos(self, arquivo_path, tamanho_bloco=TAMANHO_BLOCO):
+        """Lê o arquivo em blocos de linhas já normalizados, sem carregar o arquivo inteiro"""
+        blocos = iter(self._ler_blocos(arquivo_path, tamanho_bloco))
+        while True:
+            # Mede só a leitura de cada bloco, não o tempo de quem consome o gerador
+            inicio = time.perf_counter()
+            bloco = next(blocos, None)
+            if bloco is None:
+                return
+            metricas.observar('placas_etapa_segundos', time.perf_counter() - inicio, etapa='leitura')
+            metricas.contar('placas_etapa_total', len(bloco), etapa='leitura')
+            yield bloco
+    
+    def _ler_blocos(self, arquivo_path, tamanho_bloco):
+        blocos = armazem_colunar.ler_blocos(arquivo_path, tamanho_bloco)
+        if blocos is not None:
+            yield from blocos
+            return
+        
         if arquivo_path.endswith('.csv'):
-            df = pd.read_csv(arquivo_path, encoding='utf-8')
-        elif arquivo_path.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(arquivo_path)
+            for bloco in pd.read_csv(arquivo_path, encoding='utf-8', chunksize=tamanho_bloco):
+                yield self.normalizar_colunas(bloco)
+        elif arquivo_path.endswith('.xlsx'):
+            yield from self._ler_xlsx_em_blocos(arquivo_path, tamanho_bloco)
+        elif arquivo_path.endswith('.xls'):
+            # O openpyxl não lê .xls: carrega inteiro e entrega em blocos
+            df = self.ler_arquivo(arquivo_path)
+            for inicio in range(0, len(df), tamanho_bloco):
+                yield df.iloc[inicio:inicio + tamanho_bloco]
         else:
             raise ValueError("Formato não suportado")
-        
+    
+    def _ler_xlsx_em_blocos(self, arquivo_path, tamanho_bloco):
+        workbook = openpyxl.load_workbook(arquivo_path, read_only=True, data_only=True)
+        try:
+            linhas = workbook.active.iter_rows(values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+            colunas = [
+                str(col) if col is not None else f'Unnamed: {i}'
+                for i, col in enumerate(cabecalho)
+            ]
+            
+            inicio = 0
+            bloco = []
+            vazias = []
+            for linha in linhas:
+                # Linhas vazias só entram se houver dados depois delas (como no pandas)
+                if all(valor is None for valor in linha):
+                    vazias.append(linha[:len(colunas)])
+                    continue
+                bloco.extend(vazias)
+                vazias = []
+                bloco.append(linha[:len(colunas)])
+                if len(bloco) >= tamanho_bloco:
+                    yield self._bloco_xlsx(bloco, colunas, inicio)
+                    inicio += len(bloco)
+                    bloco = []
+            if bloco:
+                yield self._bloco_xlsx(bloco, colunas, inicio)
+        finally:
+            workbook.close()
+    
+    def _bloco_xlsx(self, linhas, colunas, inicio):
+        df = pd.DataFrame.from_records(linhas, columns=colunas, index=range(inicio, inicio + len(linhas)))
+        # Células vazias como NaN e colunas numéricas tipadas, como no pd.read_excel
+        df = df.fillna(np.nan).infer_objects()
+        return self.normalizar_colunas(df)
+    
+    def usar_leitura_em_blocos(self, arquivo_path, config=None):
+        """Arquivos grandes (ou quando pedido na config) são processados bloco a bloco"""
+        if config and 'leitura_em_blocos' in config:
+            return bool(config['leitura_em_blocos'])
+        return os.path.getsize(arquivo_path) > LIMITE_LEITURA_EM_BLOCOS
+    
+    def normalizar_colunas(self, df):
+        """Normaliza e mapeia os nomes das colunas para os nomes usados nas placas"""
         # Normalizar nomes de colunas (case insensitive e remove espaços)
-        df.columns = [col.strip().lower() for col in df.columns]
+        df.columns = [str(col).strip().lower() for col in df.columns]
         
         # Mapear colunas possíveis
         mapeamento_colunas = {
@@ -71,21 +270,44 @@ class GeradorPlacas:
         
         return df
     
+    def validar_dataframe(self, df):
+        """validar_dataframe com a medição da etapa de validação"""
+        with metricas.cronometrar('placas_etapa_segundos', etapa='validacao'):
+            invalidos = validar_dataframe(df)
+        metricas.contar('placas_etapa_total', len(df), etapa='validacao')
+        return invalidos
+    
     def validar_dados(self, df):
         """Valida todos os dados do dataframe e retorna lista de problemas"""
         problemas = []
+        nomes = coluna(df, 'Nome do produto', 'N/A')
+        indices = df.index.tolist()
         
-        for index, row in df.iterrows():
-            produto_problemas = self.validar_produto(row.to_dict())
-            if produto_problemas:
-                problemas.append({
-                    'linha': index + 2,  # +2 porque a primeira linha é cabeçalho
-                    'produto': row.get('Nome do produto', 'N/A'),
-                    'problemas': produto_problemas
-                })
+        for pos, produto_problemas in self.validar_dataframe(df).items():
+            problemas.append({
+                'linha': indices[pos] + 2,  # +2 porque a primeira linha é cabeçalho
+                'produto': nomes.iloc[pos],
+                'problemas': produto_problemas
+            })
         
         return problemas
     
+    def validar_lote(self, df, indices, tamanho_bloco=1000):
+        """Valida os produtos dos índices informados, gerando um resultado por índice"""
+        total = len(df)
+        for inicio in range(0, len(indices), tamanho_bloco):
+            bloco = indices[inicio:inicio + tamanho_bloco]
+            existentes = [i for i in bloco if 0 <= i < total]
+            problemas = self.validar_dataframe(df.iloc[existentes])
+            posicao = {indice: pos for pos, indice in enumerate(existentes)}
+            
+            for indice in bloco:
+                if indice not in posicao:
+                    yield {'indice': indice, 'valido': False, 'problemas': ['Índice do produto inválido']}
+                    continue
+                produto_problemas = problemas.get(posicao[indice], [])
+                yield {'indice': indice, 'valido': not produto_problemas, 'problemas': produto_problemas}
+    
     def validar_produto(self, produto):
         """Valida um produto individual e retorna lista de problemas"""
         problemas = []
@@ -132,148 +354,99 @@ class GeradorPlacas:
         
         return problemas
     
-    def configurar_fonte(self, canvas_obj, fonte, tamanho):
-        """Configura a fonte no canvas"""
+    def resolver_fonte(self, fonte):
+        """Retorna o nome da fonte que será usada (registrando a TTF se necessário)"""
         try:
-            if fonte and fonte not in ['Helvetica-Bold', 'Courier', 'Times-Roman']:
-                font_path = os.path.join(self.base_path, 'assets', 'fonts', f"{fonte}.ttf")
-                if os.path.exists(font_path):
-                    pdfmetrics.registerFont(TTFont(fonte, font_path))
-                    canvas_obj.setFont(fonte, tamanho)
-                else:
-                    canvas_obj.setFont("Helvetica-Bold", tamanho)
-            else:
-                canvas_obj.setFont(fonte, tamanho)
+            if fonte and fonte not in FONTES_PADRAO:
+                # A fonte TTF é lida e registrada uma vez por processo
+                if not registro_recursos.fonte(self.base_path, fonte):
+                    return "Helvetica-Bold"
+            pdfmetrics.getFont(fonte)
+            return fonte
         except:
-            canvas_obj.setFont("Helvetica-Bold", tamanho)
+            return "Helvetica-Bold"
+    
+    def configurar_fonte(self, canvas_obj, fonte, tamanho):
+        """Configura a fonte no canvas e retorna o nome da fonte efetivamente usada"""
+        fonte = self.resolver_fonte(fonte)
+        canvas_obj.setFont(fonte, tamanho)
+        return fonte
     
     def gerar_codigo_barras(self, codigo):
-        """Gera código de barras simples usando PIL (sem dependência externa)"""
+        """Gera (ou reaproveita do cache) a imagem PNG do código de barras EAN-13"""
         try:
-            if len(codigo) != 13 or not codigo.isdigit():
+            if not ean13_valido(codigo):
                 return None
+            return cache_codigos_barras(self.barcodes_folder).arquivo(codigo)
             
-            # Configurações do código de barras
-            largura = 200
-            altura = 80
-            margem = 10
-            
-            # Criar imagem
-            img = Image.new('RGB', (largura, altura), 'white')
-            draw = ImageDraw.Draw(img)
-            
-            # Desenhar código de barras simulado
-            comprimento_barra = largura - 2 * margem
-            pos_x = margem
-            
-            # Desenhar barras baseadas no código
-            for i, char in enumerate(codigo):
-                # Usar o dígito para determinar a altura da barra
-                altura_barra = 20 + (int(char) * 4)
-                
-                # Alternar entre preto e branco para simular barras
-                if i % 2 == 0:
-                    draw.rectangle([pos_x, margem, pos_x + 3, margem + altura_barra], fill='black')
-                
-                pos_x += comprimento_barra / len(codigo)
-            
-            # Adicionar texto do código
-            draw.text((largura/2 - 30, altura - 20), f"EAN-13: {codigo}", fill='black')
-            
-            # Salvar imagem
-            filename = f"barcode_{codigo}.png"
-            filepath = os.path.join(self.barcodes_folder, filename)
-            img.save(filepath)
-            
-            return filename
+        except Exception as e:
+            print(f"Erro ao gerar código de barras: {e}")
+            return None
+    
+    def imagem_codigo_barras(self, codigo):
+        """Retorna a imagem do código de barras para o ReportLab direto da memória, ou None"""
+        try:
+            with metricas.cronometrar('placas_etapa_segundos', etapa='codigo_barras'):
+                if not ean13_valido(codigo):
+                    return None
+                return cache_codigos_barras(self.barcodes_folder).imagem(codigo)
             
         except Exception as e:
             print(f"Erro ao gerar código de barras: {e}")
             return None
     
     def gerar_codigo_barras_reportlab(self, canvas_obj, x, y, codigo, largura=120, altura=30):
-        """Gera código de barras diretamente no PDF usando ReportLab"""
+        """Desenha o código de barras EAN-13 diretamente no PDF como um único caminho vetorial"""
         try:
-            if len(codigo) != 13:
-                return
-            
-            # Configurações
-            comprimento_barra = largura
-            espacamento = comprimento_barra / len(codigo)
-            
-            # Desenhar barras
-            for i, char in enumerate(codigo):
-                # Usar o dígito para determinar a altura da barra
-                altura_barra = altura * (0.3 + (int(char) * 0.05))
+            with metricas.cronometrar('placas_etapa_segundos', etapa='codigo_barras'):
+                if len(codigo) != 13:
+                    return
+                if not ean13_valido(codigo):
+                    print(f"Código de barras EAN-13 inválido (dígito verificador): {codigo}")
+                    return
                 
-                # Alternar entre barras pretas e brancas
-                if i % 2 == 0:
-                    canvas_obj.setFillColorRGB(0, 0, 0)  # Preto
-                    canvas_obj.rect(x + i * espacamento, y, espacamento - 1, altura_barra, fill=1)
-            
-            # Adicionar texto do código
-            canvas_obj.setFillColorRGB(0, 0, 0)
-            canvas_obj.setFont("Helvetica", 8)
-            canvas_obj.drawString(x, y - 10, codigo)
+                # A largura inclui as zonas quietas exigidas pelos leitores
+                modulo = largura / MODULOS_TOTAL
+                altura_dados = altura - 5 * modulo
+                
+                path = canvas_obj.beginPath()
+                for inicio, largura_barra, guarda in barras_ean13(codigo):
+                    x_barra = x + (ZONA_QUIETA_ESQUERDA + inicio) * modulo
+                    if guarda:
+                        path.rect(x_barra, y, largura_barra * modulo, altura)
+                    else:
+                        path.rect(x_barra, y + altura - altura_dados, largura_barra * modulo, altura_dados)
+                
+                canvas_obj.setFillColorRGB(0, 0, 0)  # Preto
+                canvas_obj.drawPath(path, stroke=0, fill=1)
+                
+                # Adicionar texto do código
+                canvas_obj.setFont("Helvetica", 8)
+                canvas_obj.drawString(x, y - 10, codigo)
             
         except Exception as e:
             print(f"Erro ao gerar código de barras com ReportLab: {e}")
     
-    def quebrar_texto(self, texto, largura_maxima, tamanho_fonte):
-        """Quebra texto em múltiplas linhas baseado na largura máxima"""
-        palavras = str(texto).split()
-        linhas = []
-        linha_atual = ""
-        
-        for palavra in palavras:
-            teste_linha = f"{linha_atual} {palavra}".strip()
-            # Estimativa simples de largura
-            largura_estimada = len(teste_linha) * (tamanho_fonte * 0.6)
-            
-            if largura_estimada <= largura_maxima:
-                linha_atual = teste_linha
-            else:
-                if linha_atual:
-                    linhas.append(linha_atual)
-                linha_atual = palavra
-                
-                # Se uma palavra individual for muito longa, quebra ela
-                if len(palavra) * (tamanho_fonte * 0.6) > largura_maxima:
-                    for i in range(0, len(palavra), int(largura_maxima/(tamanho_fonte * 0.6))):
-                        linhas.append(palavra[i:i+int(largura_maxima/(tamanho_fonte * 0.6))])
-                    linha_atual = ""
-        
-        if linha_atual:
-            linhas.append(linha_atual)
-        
-        return linhas
+    def quebrar_texto(self, texto, largura_maxima, tamanho_fonte, fonte='Helvetica-Bold'):
+        """Quebra texto em múltiplas linhas baseado na largura real na fonte"""
+        return list(medidor_texto.quebrar(str(texto), fonte, tamanho_fonte, largura_maxima))
     
-    def desenhar_elemento(self, canvas_obj, x, y, texto, config, elemento):
+    def desenhar_elemento(self, canvas_obj, x, y, texto, estilo, elemento):
         """Desenha um elemento individual na placa"""
-        if not config.get(f'{elemento}_visivel', True):
+        if not estilo.visivel:
             return y
         
-        # Configurar fonte específica do elemento
-        fonte = config.get(f'fonte_{elemento}', 'Helvetica-Bold')
-        tamanho_fonte = config.get(f'fonte_tamanho_{elemento}', 12)
-        self.configurar_fonte(canvas_obj, fonte, tamanho_fonte)
-        
-        # Configurar cor
-        cor = config.get(f'{elemento}_cor', '#000000')
-        if cor.startswith('#'):
-            r = int(cor[1:3], 16) / 255.0
-            g = int(cor[3:5], 16) / 255.0
-            b = int(cor[5:7], 16) / 255.0
-            canvas_obj.setFillColorRGB(r, g, b)
+        canvas_obj.setFont(estilo.fonte, estilo.tamanho)
+        if estilo.cor is not None:
+            canvas_obj.setFillColorRGB(*estilo.cor)
         
         # Quebrar texto se necessário (especialmente para nomes longos)
-        largura_maxima = config.get(f'{elemento}_largura', 300)
         texto_str = str(texto)
         
-        if elemento == 'nome' and len(texto_str) > 20:
+        if elemento == 'nome' and medidor_texto.largura(texto_str, estilo.fonte, estilo.tamanho) > estilo.largura:
             # Para nomes longos, quebrar em múltiplas linhas
-            linhas = self.quebrar_texto(texto_str, largura_maxima, tamanho_fonte)
-            espacamento = tamanho_fonte + 2
+            linhas = self.quebrar_texto(texto_str, estilo.largura, estilo.tamanho, estilo.fonte)
+            espacamento = estilo.tamanho + 2
             
             for i, linha in enumerate(linhas):
                 if i < 3:  # Máximo 3 linhas
@@ -282,23 +455,47 @@ class GeradorPlacas:
             return y - (min(len(linhas), 3) * espacamento)
         else:
             # Para outros elementos, desenhar normalmente
-            if len(texto_str) * (tamanho_fonte * 0.6) > largura_maxima:
-                # Truncar se muito longo
-                chars_max = int(largura_maxima / (tamanho_fonte * 0.6))
-                texto_str = texto_str[:chars_max-3] + "..."
-            
+            # Truncar se muito longo
+            texto_str = medidor_texto.truncar(texto_str, estilo.fonte, estilo.tamanho, estilo.largura)
             canvas_obj.drawString(x, y, texto_str)
-            return y - (tamanho_fonte + 10)
+            return y - (estilo.tamanho + 10)
     
-    def desenhar_placa(self, canvas_obj, produto, pos_x, pos_y, largura, altura, config):
-        """Desenha uma placa individual com layout personalizado"""
+    def form_fundo(self, canvas_obj, fundo, largura, altura):
+        """Cria (uma vez por PDF) o form XObject do fundo e retorna seu nome, ou None"""
+        recurso = registro_recursos.fundo(self.base_path, fundo)
+        if recurso is None:
+            return None
+        img, chave = recurso
         
-        # Fundo personalizado
-        if config.get('fundo') and config['fundo'] != 'padrao':
-            fundo_path = os.path.join(self.base_path, 'assets', 'backgrounds', config['fundo'])
-            if os.path.exists(fundo_path):
-                img = ImageReader(fundo_path)
-                canvas_obj.drawImage(img, pos_x, pos_y, largura, altura, mask='auto')
+        nome_form = f"fundo_{chave}_{largura:.2f}x{altura:.2f}"
+        if not canvas_obj.hasForm(nome_form):
+            canvas_obj.beginForm(nome_form, 0, 0, largura, altura)
+            canvas_obj.drawImage(img, 0, 0, largura, altura, mask='auto')
+            canvas_obj.endForm()
+        return nome_form
+    
+    def desenhar_fundo(self, canvas_obj, fundo, pos_x, pos_y, largura, altura):
+        """Desenha o fundo como um form XObject incluído uma única vez em cada PDF"""
+        nome_form = self.form_fundo(canvas_obj, fundo, largura, altura)
+        if nome_form is None:
+            return
+        
+        canvas_obj.saveState()
+        canvas_obj.translate(pos_x, pos_y)
+        canvas_obj.doForm(nome_form)
+        canvas_obj.restoreState()
+    
+    def desenhar_placa(self, canvas_obj, produto, pos_x, pos_y, plano):
+        """Desenha uma placa individual a partir do plano de layout já compilado"""
+        largura = plano.placa_largura
+        altura = plano.placa_altura
+        
+        # Fundo personalizado (estendido até a sangria)
+        if plano.fundo:
+            sangria = plano.sangria
+            self.desenhar_fundo(
+                canvas_obj, plano.fundo, pos_x - sangria, pos_y - sangria, largura + 2 * sangria, altura + 2 * sangria
+            )
         
         # Ajustar coordenadas relativas
         x_base = pos_x
@@ -308,9 +505,7 @@ class GeradorPlacas:
         
         # Nome do Produto
         nome = str(produto['Nome do produto'])
-        nome_x = x_base + config.get('nome_x', 20)
-        nome_y = current_y
-        current_y = self.desenhar_elemento(canvas_obj, nome_x, nome_y, nome, config, 'nome')
+        current_y = self.desenhar_elemento(canvas_obj, x_base + plano.nome.x, current_y, nome, plano.nome, 'nome')
         
         # Valor
         try:
@@ -319,157 +514,479 @@ class GeradorPlacas:
         except:
             valor_str = str(produto['Preço'])
         
-        valor_x = x_base + config.get('valor_x', 20)
-        valor_y = current_y - config.get('valor_espacamento', 10)
-        current_y = self.desenhar_elemento(canvas_obj, valor_x, valor_y, valor_str, config, 'valor')
+        estilo = plano.valor
+        current_y = self.desenhar_elemento(
+            canvas_obj, x_base + estilo.x, current_y - estilo.espacamento, valor_str, estilo, 'valor'
+        )
         
         # Data da Oferta
-        data = str(produto['Data da Oferta'])
-        data_str = f"Válido até: {data}"
-        data_x = x_base + config.get('data_x', 20)
-        data_y = current_y - config.get('data_espacamento', 10)
-        current_y = self.desenhar_elemento(canvas_obj, data_x, data_y, data_str, config, 'data')
+        data_str = f"{ROTULO_DATA}{produto['Data da Oferta']}"
+        estilo = plano.data
+        current_y = self.desenhar_elemento(
+            canvas_obj, x_base + estilo.x, current_y - estilo.espacamento, data_str, estilo, 'data'
+        )
         
         # Código de Barras
         codigo = str(produto.get('Codigo de Barras', ''))
-        if codigo and config.get('codigo_visivel', True):
-            codigo_x = x_base + config.get('codigo_x', 20)
-            codigo_y = current_y - config.get('codigo_espacamento', 20)
+        estilo = plano.codigo
+        if codigo and estilo.visivel:
+            codigo_x = x_base + estilo.x
+            codigo_y = current_y - estilo.espacamento
+            largura_imagem = plano.codigo_largura_imagem
+            altura_imagem = plano.codigo_altura_imagem
             
             # Tentar usar imagem do código de barras
-            if config.get('usar_imagem_codigo', False) and len(codigo) == 13:
-                barcode_filename = self.gerar_codigo_barras(codigo)
-                if barcode_filename:
-                    barcode_path = os.path.join(self.barcodes_folder, barcode_filename)
-                    if os.path.exists(barcode_path):
-                        img = ImageReader(barcode_path)
-                        largura_imagem = config.get('codigo_largura_imagem', 120)
-                        altura_imagem = config.get('codigo_altura_imagem', 30)
-                        canvas_obj.drawImage(img, codigo_x, codigo_y - altura_imagem, largura_imagem, altura_imagem)
-                        codigo_y -= altura_imagem + 5
-                else:
-                    # Fallback: gerar código de barras diretamente
-                    self.gerar_codigo_barras_reportlab(
-                        canvas_obj, 
-                        codigo_x, 
-                        codigo_y - 30,
-                        codigo,
-                        config.get('codigo_largura_imagem', 120),
-                        config.get('codigo_altura_imagem', 30)
-                    )
+            img = None
+            if plano.usar_imagem_codigo and len(codigo) == 13:
+                img = self.imagem_codigo_barras(codigo)
+            
+            if img:
+                canvas_obj.drawImage(img, codigo_x, codigo_y - altura_imagem, largura_imagem, altura_imagem)
+                codigo_y -= altura_imagem + 5
             else:
-                # Gerar código de barras diretamente no PDF
+                # Gerar código de barras diretamente no PDF, abaixo do rótulo "Cód:"
+                topo_barras = codigo_y - estilo.tamanho - 4
                 self.gerar_codigo_barras_reportlab(
-                    canvas_obj, 
-                    codigo_x, 
-                    codigo_y - 30,
-                    codigo,
-                    config.get('codigo_largura_imagem', 120),
-                    config.get('codigo_altura_imagem', 30)
+                    canvas_obj, codigo_x, topo_barras - altura_imagem, codigo, largura_imagem, altura_imagem
                 )
             
             # Desenhar código como texto
-            codigo_str = f"Cód: {codigo}"
-            self.desenhar_elemento(canvas_obj, codigo_x, codigo_y, codigo_str, config, 'codigo')
+            self.desenhar_elemento(canvas_obj, codigo_x, codigo_y, f"{ROTULO_CODIGO}{codigo}", estilo, 'codigo')
         
         # Bordas
-        if config.get('bordas', True):
+        if plano.bordas:
             canvas_obj.setStrokeColorRGB(0, 0, 0)
             canvas_obj.setLineWidth(1)
             canvas_obj.rect(pos_x, pos_y, largura, altura)
     
-    def gerar_pdf(self, produtos, output_file, config):
-        tamanho = config['tamanho']
-        
-        if tamanho == 'A5':
-            # 2 placas A5 por folha A4
-            page_size = A4
-            placas_por_pagina = 2
-            placa_width = A4[0] / 2
-            placa_height = A4[1]
-        elif tamanho == 'A6':
-            # 4 placas A6 por folha A4
-            page_size = A4
-            placas_por_pagina = 4
-            placa_width = A4[0] / 2
-            placa_height = A4[1] / 2
-        else:
-            page_size = self.pagesizes[tamanho]
-            placas_por_pagina = 1
-            placa_width = page_size[0]
-            placa_height = page_size[1]
+    def _estilo_elemento(self, config, elemento, x_padrao=20, espacamento_padrao=0):
+        return EstiloElemento(
+            visivel=bool(config.get(f'{elemento}_visivel', True)),
+            fonte=self.resolver_fonte(config.get(f'fonte_{elemento}', 'Helvetica-Bold')),
+            tamanho=config.get(f'fonte_tamanho_{elemento}', 12),
+            cor=cor_rgb(config.get(f'{elemento}_cor', '#000000')),
+            largura=config.get(f'{elemento}_largura', 300),
+            x=config.get(f'{elemento}_x', x_padrao),
+            espacamento=config.get(f'{elemento}_espacamento', espacamento_padrao)
+        )
+    
+    def compilar_plano(self, config):
+        """Resolve a configuração em um PlanoLayout imutável"""
+        grade = imposicao(config)
+        fundo = config.get('fundo')
+        # Os elementos são posicionados em pontos: numa placa menor que a de referência, tudo é reduzido junto
+        escala = min(1, grade.placa_largura / PLACA_REFERENCIA[0], grade.placa_altura / PLACA_REFERENCIA[1])
+        
+        return PlanoLayout(
+            chave=chave_config(config),
+            tamanho=config['tamanho'],
+            page_size=grade.folha,
+            placas_por_pagina=grade.placas_por_folha,
+            placa_largura=grade.placa_largura / escala,
+            placa_altura=grade.placa_altura / escala,
+            posicoes=grade.posicoes,
+            rotacao=grade.rotacao,
+            escala=escala,
+            sangria=grade.sangria / escala,
+            fundo=fundo if fundo and fundo != 'padrao' else None,
+            bordas=bool(config.get('bordas', True)),
+            nome=self._estilo_elemento(config, 'nome'),
+            valor=self._estilo_elemento(config, 'valor', espacamento_padrao=10),
+            data=self._estilo_elemento(config, 'data', espacamento_padrao=10),
+            codigo=self._estilo_elemento(config, 'codigo', espacamento_padrao=20),
+            usar_imagem_codigo=bool(config.get('usar_imagem_codigo', False)),
+            codigo_largura_imagem=config.get('codigo_largura_imagem', 120),
+            codigo_altura_imagem=config.get('codigo_altura_imagem', 30)
+        )
+    
+    def estado_recursos(self, plano):
+        """Fontes resolvidas (com a assinatura do arquivo TTF) e fundo usados pelo plano"""
+        fontes = [
+            (estilo.fonte, registro_recursos.assinatura_fonte(self.base_path, estilo.fonte))
+            for estilo in (plano.nome, plano.valor, plano.data, plano.codigo)
+        ]
+        fundo = registro_recursos.assinatura_fundo(self.base_path, plano.fundo) if plano.fundo else None
+        return [fontes, plano.fundo, fundo]
+    
+    def plano_layout(self, config):
+        """Plano compilado da configuração, reaproveitado entre execuções com a mesma configuração"""
+        if isinstance(config, PlanoLayout):
+            return config
+        with metricas.cronometrar('placas_etapa_segundos', etapa='layout'):
+            # O estado dos arquivos TTF entra na chave: instalar ou trocar uma fonte recompila o plano
+            fontes = tuple(
+                registro_recursos.assinatura_fonte(self.base_path, config.get(f'fonte_{elemento}'))
+                for elemento in ('nome', 'valor', 'data', 'codigo')
+            )
+            chave = (self.base_path, chave_config(config), fontes)
+            return cache_planos.obter(chave, lambda: self.compilar_plano(config))
+    
+    def posicionar_placa(self, canvas_obj, pos_x, pos_y, plano):
+        """Leva a origem à placa (girada e reduzida conforme o plano) e recorta o que passar da sua área"""
+        canvas_obj.translate(pos_x, pos_y)
+        if plano.rotacao:
+            canvas_obj.rotate(plano.rotacao)
+        if plano.escala != 1:
+            canvas_obj.scale(plano.escala, plano.escala)
+        if plano.placas_por_pagina > 1:
+            # Textos mais largos que a placa não invadem as vizinhas
+            sangria = plano.sangria
+            area = canvas_obj.beginPath()
+            area.rect(-sangria, -sangria, plano.placa_largura + 2 * sangria, plano.placa_altura + 2 * sangria)
+            canvas_obj.clipPath(area, stroke=0, fill=0)
+    
+    def desenhar_placa_na_posicao(self, canvas_obj, produto, pos_x, pos_y, plano):
+        """Desenha a placa na posição da imposição, recortada na sua área"""
+        if plano.placas_por_pagina == 1 and not plano.rotacao and plano.escala == 1:
+            self.desenhar_placa(canvas_obj, produto, pos_x, pos_y, plano)
+            return
+        canvas_obj.saveState()
+        self.posicionar_placa(canvas_obj, pos_x, pos_y, plano)
+        self.desenhar_placa(canvas_obj, produto, 0, 0, plano)
+        canvas_obj.restoreState()
+    
+    def gerar_pdf(self, produtos, output_file, config, progresso=None):
+        """Gera o PDF das placas; progresso(renderizadas, total) é chamado após cada placa"""
+        self.gerar_pdf_em_blocos([produtos], output_file, config, progresso, len(produtos))
+    
+    def gerar_pdf_em_blocos(self, blocos, output_file, config, progresso=None, total=None):
+        """Gera o PDF consumindo os produtos bloco a bloco (total None quando desconhecido)"""
+        plano = self.plano_layout(config)
+        placas_por_pagina = plano.placas_por_pagina
         
-        c = canvas.Canvas(output_file, pagesize=page_size)
+        c = canvas.Canvas(output_file, pagesize=plano.page_size)
+        i = 0
         
-        for i, (_, produto) in enumerate(produtos.iterrows()):
-            if i > 0 and i % placas_por_pagina == 0:
-                c.showPage()
-            
-            if tamanho == 'A5':
-                # 2 placas lado a lado
-                coluna = i % 2
-                pos_x = coluna * placa_width
-                pos_y = 0
-            elif tamanho == 'A6':
-                # 4 placas em grid 2x2
-                coluna = i % 2
-                linha = (i // 2) % 2
-                pos_x = coluna * placa_width
-                pos_y = (1 - linha) * placa_height  # Inverter para começar de cima
-            else:
-                pos_x = 0
-                pos_y = 0
-            
-            self.desenhar_placa(c, produto, pos_x, pos_y, placa_width, placa_height, config)
+        # Com cache_fragmentos, placas já desenhadas antes (nesta ou em outra execução) são copiadas do cache
+        cache = cache_fragmentos(self.base_path) if config.get('cache_fragmentos', False) else None
+        fragmentos = cache.sessao(chave_layout(config), self.estado_recursos(plano)) if cache is not None else None
         
-        c.save()
+        try:
+            for bloco in blocos:
+                for _, produto in bloco.iterrows():
+                    if i > 0 and i % placas_por_pagina == 0:
+                        c.showPage()
+                    
+                    pos_x, pos_y = plano.posicoes[i % placas_por_pagina]
+                    with metricas.cronometrar('placas_etapa_segundos', etapa='desenho'):
+                        if fragmentos is not None:
+                            c.saveState()
+                            self.posicionar_placa(c, pos_x, pos_y, plano)
+                            fragmentos.desenhar(c, produto, lambda: self.desenhar_placa(c, produto, 0, 0, plano))
+                            c.restoreState()
+                        else:
+                            self.desenhar_placa_na_posicao(c, produto, pos_x, pos_y, plano)
+                    i += 1
+                    
+                    if progresso:
+                        progresso(i, total)
+        finally:
+            if fragmentos is not None:
+                fragmentos.concluir()
+        
+        if i == 0:
+            raise ValueError("Nenhum produto válido para gerar placas")
+        
+        with metricas.cronometrar('placas_etapa_segundos', etapa='gravacao'):
+            c.save()
+    
+    def execucao_delta(self, manifesto, config, somente_alterados=False, produtos_selecionados=None):
+        """Comparação com a geração anterior registrada no manifesto (None sem manifesto)"""
+        if not manifesto:
+            return None
+        return ExecucaoDelta(
+            self.manifestos, manifesto, config,
+            somente_alterados=somente_alterados, produtos_selecionados=produtos_selecionados
+        )
+    
+    def numerar_ocorrencias(self, delta, arquivo_path, em_blocos):
+        """Numera as repetições com o arquivo inteiro, para que uma seleção use os mesmos números de uma geração completa"""
+        blocos = self.ler_arquivo_em_blocos(arquivo_path) if em_blocos else [self.ler_arquivo(arquivo_path)]
+        for bloco in blocos:
+            delta.numerar(bloco)
     
-    def processar_arquivo(self, arquivo_path, config, produtos_selecionados=None):
-        """Processa arquivo e gera PDF, retornando relatório"""
-        produtos_df = self.ler_arquivo(arquivo_path)
+    def processar_arquivo(self, arquivo_path, config, produtos_selecionados=None, output_file=None, progresso=None,
+                          manifesto=None, somente_alterados=False):
+        """Processa arquivo e gera PDF, retornando relatório (com somente_alterados, só o que mudou desde o manifesto)"""
+        if output_file is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = os.path.join(self.base_path, 'outputs', f'placas_{timestamp}.pdf')
         
-        # Filtrar produtos selecionados se especificado
+        delta = self.execucao_delta(manifesto, config, somente_alterados, produtos_selecionados)
+        
+        if self.usar_leitura_em_blocos(arquivo_path, config):
+            return self._processar_em_blocos(arquivo_path, config, produtos_selecionados, output_file, progresso, delta)
+        
+        # Com seleção, só as linhas selecionadas são lidas e validadas
         if produtos_selecionados is not None:
-            produtos_df = produtos_df.iloc[produtos_selecionados]
+            produtos_df = self.ler_linhas(arquivo_path, produtos_selecionados)
+            if delta is not None:
+                self.numerar_ocorrencias(delta, arquivo_path, em_blocos=False)
+        else:
+            produtos_df = self.ler_arquivo(arquivo_path)
+            if delta is not None:
+                delta.numerar(produtos_df)
         
         # Validar produtos e filtrar apenas os válidos
-        produtos_validos = []
+        invalidos = self.validar_dataframe(produtos_df)
+        nomes = coluna(produtos_df, 'Nome do produto', 'N/A')
+        indices = produtos_df.index.tolist()
         relatorio = {
             'total_produtos': len(produtos_df),
+            'produtos_validos': len(produtos_df) - len(invalidos),
+            'produtos_invalidos': len(invalidos),
+            'erros': [
+                {
+                    'indice': indices[pos],
+                    'produto': nomes.iloc[pos],
+                    'problemas': problemas
+                }
+                for pos, problemas in invalidos.items()
+            ]
+        }
+        
+        if relatorio['produtos_validos'] == 0:
+            raise ValueError("Nenhum produto válido para gerar placas")
+        
+        validos = np.ones(len(produtos_df), dtype=bool)
+        validos[list(invalidos)] = False
+        produtos_validos_df = produtos_df[validos]
+        
+        if delta is not None:
+            produtos_validos_df = delta.filtrar(produtos_validos_df)
+            if len(produtos_validos_df) == 0:
+                raise ValueError("Nenhum produto alterado desde a última geração")
+        
+        if WORKERS_RENDERIZACAO > 1:
+            gerar_pdf_paralelo(self, produtos_validos_df, output_file, config, progresso)
+        else:
+            self.gerar_pdf(produtos_validos_df, output_file, config, progresso)
+        
+        if delta is not None:
+            delta.concluir(relatorio)
+        return output_file, relatorio
+    
+    def _processar_em_blocos(self, arquivo_path, config, produtos_selecionados, output_file, progresso, delta=None):
+        """Lê, valida e desenha bloco a bloco; a seleção é aplicada na ordem pedida, como em processar_arquivo"""
+        relatorio = self.novo_relatorio()
+        blocos = self.produtos_validos_em_blocos(
+            arquivo_path, produtos_selecionados, relatorio, em_blocos=True, delta=delta
+        )
+        self.gerar_pdf_em_blocos(blocos, output_file, config, progresso)
+        if delta is not None:
+            delta.concluir(relatorio)
+        return output_file, relatorio
+    
+    def novo_relatorio(self):
+        return {
+            'total_produtos': 0,
             'produtos_validos': 0,
             'produtos_invalidos': 0,
             'erros': []
         }
+    
+    def produtos_validos_em_blocos(self, arquivo_path, produtos_selecionados, relatorio, em_blocos=None, delta=None):
+        """Gera blocos só com os produtos válidos (e, com delta, alterados), acumulando contagens e erros no relatório"""
+        if em_blocos is None:
+            em_blocos = self.usar_leitura_em_blocos(arquivo_path)
+        
+        if delta is not None and produtos_selecionados is not None:
+            self.numerar_ocorrencias(delta, arquivo_path, em_blocos)
+        
+        indice = None
+        if em_blocos and produtos_selecionados is not None and arquivo_path.endswith('.csv'):
+            indice = cache_indices.obter(arquivo_path)
         
-        for index, produto in produtos_df.iterrows():
-            problemas = self.validar_produto(produto.to_dict())
-            if not problemas:
-                produtos_validos.append(produto)
-                relatorio['produtos_validos'] += 1
+        # Com seleção, todos os caminhos seguem df.iloc[produtos_selecionados]: ordem pedida, com repetições
+        if indice is not None:
+            # Seleção em arquivo grande já indexado: lê só as linhas escolhidas
+            blocos = (
+                self.ler_linhas(arquivo_path, produtos_selecionados[inicio:inicio + TAMANHO_BLOCO])
+                for inicio in range(0, len(produtos_selecionados), TAMANHO_BLOCO)
+            )
+        elif em_blocos and produtos_selecionados is not None:
+            blocos = self._selecionar_em_blocos(arquivo_path, produtos_selecionados)
+        elif em_blocos:
+            blocos = self.ler_arquivo_em_blocos(arquivo_path)
+        else:
+            if produtos_selecionados is not None:
+                df = self.ler_linhas(arquivo_path, produtos_selecionados)
             else:
-                relatorio['produtos_invalidos'] += 1
-                relatorio['erros'].append({
-                    'indice': index,
-                    'produto': produto.get('Nome do produto', 'N/A'),
-                    'problemas': problemas
-                })
+                df = self.ler_arquivo(arquivo_path)
+            blocos = (df.iloc[inicio:inicio + TAMANHO_BLOCO] for inicio in range(0, len(df), TAMANHO_BLOCO))
         
-        if not produtos_validos:
-            raise ValueError("Nenhum produto válido para gerar placas")
+        for bloco in blocos:
+            if delta is not None and produtos_selecionados is None:
+                delta.numerar(bloco)
+            invalidos = self.validar_dataframe(bloco)
+            nomes = coluna(bloco, 'Nome do produto', 'N/A')
+            indices = bloco.index.tolist()
+            relatorio['total_produtos'] += len(bloco)
+            relatorio['produtos_validos'] += len(bloco) - len(invalidos)
+            relatorio['produtos_invalidos'] += len(invalidos)
+            relatorio['erros'].extend(
+                {'indice': indices[pos], 'produto': nomes.iloc[pos], 'problemas': problemas}
+                for pos, problemas in invalidos.items()
+            )
+            
+            validos = np.ones(len(bloco), dtype=bool)
+            validos[list(invalidos)] = False
+            if delta is not None:
+                yield delta.filtrar(bloco[validos])
+            else:
+                yield bloco[validos]
+    
+    def _selecionar_em_blocos(self, arquivo_path, produtos_selecionados):
+        """Como ler_linhas, mas percorrendo o arquivo em blocos e guardando só as linhas selecionadas"""
+        linhas, total = self._linhas_em_blocos(arquivo_path, set(p for p in produtos_selecionados if p >= 0))
+        if any(p < -total or p >= total for p in produtos_selecionados):
+            raise IndexError('positional indexers are out-of-bounds')
+        posicoes = [p + total if p < 0 else p for p in produtos_selecionados]
+        faltantes = set(posicoes).difference(linhas.index)
+        if faltantes:
+            # Posições negativas só são conhecidas depois da primeira passada
+            linhas = pd.concat([linhas, self._linhas_em_blocos(arquivo_path, faltantes)[0]])
         
-        produtos_validos_df = pd.DataFrame(produtos_validos)
+        for inicio in range(0, len(posicoes), TAMANHO_BLOCO):
+            yield linhas.loc[posicoes[inicio:inicio + TAMANHO_BLOCO]]
+    
+    def _linhas_em_blocos(self, arquivo_path, posicoes):
+        """(linhas das posições pedidas, indexadas pela posição no arquivo, total de linhas do arquivo)"""
+        partes = []
+        total = 0
+        for bloco in self.ler_arquivo_em_blocos(arquivo_path):
+            escolhidas = [p for p in range(total, total + len(bloco)) if p in posicoes]
+            parte = bloco.iloc[[p - total for p in escolhidas]]
+            parte.index = escolhidas
+            partes.append(parte)
+            total += len(bloco)
+        return pd.concat(partes) if partes else pd.DataFrame(), total
+    
+    def analisar_arquivo(self, arquivo_path, linhas_preview=10):
+        """Retorna (preview, total de produtos, problemas) para a tela de upload"""
+        if not self.usar_leitura_em_blocos(arquivo_path):
+            df = self.ler_arquivo(arquivo_path)
+            return df.head(linhas_preview), len(df), self.validar_dados(df)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = os.path.join(self.base_path, 'outputs', f'placas_{timestamp}.pdf')
+        preview = None
+        total = 0
+        problemas = []
+        tipos = []
+        conversao = armazem_colunar.conversao(arquivo_path)
+        try:
+            for bloco in self.ler_arquivo_em_blocos(arquivo_path):
+                if preview is None:
+                    preview = bloco.head(linhas_preview)
+                total += len(bloco)
+                tipos.append(bloco.dtypes)
+                if conversao is not None:
+                    conversao.adicionar(bloco)
+                problemas.extend(self.validar_dados(bloco))
+        except Exception:
+            if conversao is not None:
+                conversao.descartar()
+            raise
         
-        self.gerar_pdf(produtos_validos_df, output_file, config)
+        if conversao is not None:
+            conversao.concluir()
+        if preview is None:
+            preview = pd.DataFrame()
+        elif arquivo_path.endswith('.csv') and not armazem_colunar.convertido(arquivo_path):
+            cache_indices.guardar(arquivo_path, preview.columns, tipos_combinados(tipos))
+        return preview, total, problemas
+    
+    def chave_preview(self, produtos, config, dpi, colunas=None):
+        """Hash dos campos dos produtos, do layout (com fontes e fundo em disco) e da resolução do preview"""
+        conteudo = {
+            'produtos': [{campo: produto.get(campo) for campo in CAMPOS_PRODUTO} for produto in produtos],
+            'layout': chave_layout(config),
+            'recursos': self.estado_recursos(self.plano_layout(config)),
+            'dpi': dpi,
+            'colunas': colunas,
+            'raster': preview_raster.disponivel()
+        }
+        texto = json.dumps(conteudo, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:32]
+    
+    def _config_preview(self, config):
+        # Preview pedido antes de escolher o tamanho usa a placa A4
+        return config if config.get('tamanho') else {**config, 'tamanho': 'A4'}
+    
+    def gerar_preview_placa(self, produto, config, dpi=None):
+        """Gera (ou reaproveita do cache) a imagem de preview individual de uma placa"""
+        config = self._config_preview(config)
+        dpi = preview_raster.dpi_valido(dpi, DPI_PREVIEW)
+        chave = self.chave_preview([produto], config, dpi)
+        nome = f'preview_{chave}.png'
+        cache = cache_previews(self.previews_folder)
         
-        return output_file, relatorio
+        if cache.obter(nome) is None:
+            with metricas.cronometrar('placas_etapa_segundos', etapa='preview'):
+                cache.guardar(nome, self._renderizar_preview(produto, config, dpi))
+        
+        return os.path.join(self.previews_folder, nome)
+    
+    def gerar_folha_contatos(self, produtos, config, dpi=None, colunas=None):
+        """Gera (ou reaproveita do cache) uma imagem com as miniaturas das placas de vários produtos"""
+        if not produtos:
+            raise ValueError("Nenhum produto válido para o preview")
+        if len(produtos) > preview_raster.MAX_PREVIEW_LOTE:
+            raise ValueError(f"No máximo {preview_raster.MAX_PREVIEW_LOTE} produtos por folha de contatos")
+        config = self._config_preview(config)
+        dpi = preview_raster.dpi_valido(dpi, DPI_MINIATURA)
+        if self.pixels_folha_contatos(len(produtos), config, dpi) > preview_raster.MAX_PIXELS_FOLHA:
+            raise ValueError("Folha de contatos grande demais: reduza o DPI ou a quantidade de produtos")
+        chave = self.chave_preview(produtos, config, dpi, colunas)
+        nome = f'preview_lote_{chave}.png'
+        cache = cache_previews(self.previews_folder)
+        
+        if cache.obter(nome) is None:
+            with metricas.cronometrar('placas_etapa_segundos', etapa='preview'):
+                miniaturas = miniaturas_paralelas(self, produtos, config, dpi)
+                cache.guardar(nome, preview_raster.png(preview_raster.folha_contatos(miniaturas, colunas)))
+        
+        return os.path.join(self.previews_folder, nome)
+    
+    def pixels_folha_contatos(self, quantidade, config, dpi=None):
+        """Soma dos pixels das miniaturas de uma folha de contatos com essa quantidade de placas"""
+        plano = self.plano_layout(self._config_preview(config))
+        dpi = preview_raster.dpi_valido(dpi, DPI_MINIATURA)
+        pixels_placa = preview_raster.pixels(plano.placa_largura * plano.escala, plano.placa_altura * plano.escala, dpi)
+        return quantidade * pixels_placa
+    
+    def pdf_placas_individuais(self, produtos, config):
+        """PDF com uma placa por página, do tamanho da placa, desenhada pelo mesmo código do PDF final"""
+        plano = self.plano_layout(config)
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=(plano.placa_largura * plano.escala, plano.placa_altura * plano.escala))
+        for produto in produtos:
+            if plano.escala != 1:
+                c.scale(plano.escala, plano.escala)
+            # Campos ausentes no produto enviado pelo editor ficam em branco
+            self.desenhar_placa(c, {campo: produto.get(campo, '') for campo in CAMPOS_PRODUTO}, 0, 0, plano)
+            c.showPage()
+        c.save()
+        return buffer.getvalue()
+    
+    def miniaturas(self, produtos, config, dpi):
+        """Imagens das placas dos produtos (lista de dicts) na resolução pedida"""
+        if not preview_raster.disponivel():
+            return [Image.open(io.BytesIO(self._renderizar_preview_aproximado(produto, config))) for produto in produtos]
+        return preview_raster.rasterizar(self.pdf_placas_individuais(produtos, config), dpi)
+    
+    def _renderizar_preview(self, produto, config, dpi):
+        """Rasteriza a placa do produto e retorna os bytes do PNG"""
+        if not preview_raster.disponivel():
+            return self._renderizar_preview_aproximado(produto, config)
+        try:
+            return preview_raster.png(self.miniaturas([produto], config, dpi)[0])
+        except Exception as e:
+            print(f"Erro ao rasterizar preview: {e}")
+            return self._renderizar_preview_aproximado(produto, config)
     
-    def gerar_preview_placa(self, produto, config):
-        """Gera uma imagem de preview individual para uma placa"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        preview_path = os.path.join(self.previews_folder, f'preview_{timestamp}.png')
+    def _renderizar_preview_aproximado(self, produto, config):
+        """Desenha com PIL uma aproximação do nome e do valor (sem pypdfium2) e retorna os bytes do PNG"""
+        buffer = io.BytesIO()
         
         try:
             # Criar imagem de preview
@@ -508,8 +1025,8 @@ class GeradorPlacas:
                     else:
                         d.text((elemento['x'], elemento['y']), texto, fill=elemento['cor'])
             
-            img.save(preview_path)
-            return preview_path
+            img.save(buffer, format='PNG')
+            return buffer.getvalue()
             
         except Exception as e:
             print(f"Erro ao gerar preview: {e}")
@@ -517,5 +1034,6 @@ class GeradorPlacas:
             img = Image.new('RGB', (400, 300), color='white')
             d = ImageDraw.Draw(img)
             d.text((50, 150), "Preview da Placa", fill='black')
-            img.save(preview_path)
-            return preview_path
\ No newline at end of file
+            buffer = io.BytesIO()
+            img.save(buffer, format='PNG')
+            return buffer.getvalue()
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""Configuração do gunicorn para o gerador de placas (gunicorn -c gunicorn.conf.py wsgi:app)
+
+Tudo pode ser ajustado por variáveis de ambiente:
+    PLACAS_HOST, PLACAS_PORTA        endereço de escuta (0.0.0.0:5000)
+    PLACAS_PROCESSOS                 processos de trabalho (número de CPUs)
+    PLACAS_THREADS                   threads por processo (8)
+    PLACAS_TIMEOUT                   segundos até uma requisição travada derrubar o processo (300)
+    PLACAS_GRACEFUL_TIMEOUT          segundos para terminar o que está em andamento ao desligar (60)
+    PLACAS_RENDER_SIMULTANEOS        PDFs gerados na própria requisição ao mesmo tempo, por processo (2)
+    PLACAS_PRELOAD=1                 aquece fontes, fundos e planos antes de atender
+    PLACAS_FILA=0                    não inicia o processo da fila (rodando python fila.py em outro lugar)
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = f"{os.environ.get('PLACAS_HOST', '0.0.0.0')}:{os.environ.get('PLACAS_PORTA', 5000)}"
+workers = int(os.environ.get('PLACAS_PROCESSOS', multiprocessing.cpu_count()))
+# Threads atendem os endpoints leves enquanto outras geram PDFs (limitadas por PLACAS_RENDER_SIMULTANEOS)
+worker_class = 'gthread'
+threads = int(os.environ.get('PLACAS_THREADS', 8))
+# Um PDF grande pode levar minutos: o timeout padrão (30s) mataria o processo no meio da geração
+timeout = int(os.environ.get('PLACAS_TIMEOUT', 300))
+graceful_timeout = int(os.environ.get('PLACAS_GRACEFUL_TIMEOUT', 60))
+keepalive = 5
+# Sem preload_app: a fila de trabalhos inicia threads ao importar o app, e threads não sobrevivem ao fork
+preload_app = False
+accesslog = '-'
+
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+_processo_fila = None
+
+
+def on_starting(server):
+    """No master, antes dos processos: devolve à fila os trabalhos interrompidos e inicia o processo da fila"""
+    global _processo_fila
+    from fila_trabalhos import FilaTrabalhos
+
+    FilaTrabalhos(os.path.join(PASTA, 'trabalhos.db'), None)
+    # Processos reiniciados depois não podem devolver trabalhos que outro processo está executando
+    os.environ['PLACAS_RECUPERAR_TRABALHOS'] = '0'
+
+    # Os PDFs da fila rodam em um único processo separado; os processos de atendimento só enfileiram
+    iniciar_fila = os.environ.get('PLACAS_FILA', '1') == '1'
+    os.environ['PLACAS_FILA'] = '0'
+    if iniciar_fila:
+        _processo_fila = subprocess.Popen([sys.executable, os.path.join(PASTA, 'fila.py')], cwd=PASTA)
+
+
+def on_exit(server):
+    if _processo_fila is not None:
+        _processo_fila.terminate()
+        try:
+            _processo_fila.wait(graceful_timeout)
+        except subprocess.TimeoutExpired:
+            _processo_fila.kill()
+
+
+def post_worker_init(worker):
+    if os.environ.get('PLACAS_PRELOAD') == '1':
+        from app import aquecer
+        aquecer()
+
+
+def worker_exit(server, worker):
+    from app import encerrar
+    encerrar(timeout=graceful_timeout)
@@ -0,0 +1,143 @@
+import math
+from dataclasses import dataclass
+
+from reportlab.lib.pagesizes import A3, A4, mm
+
+FOLHAS = {
+    'A3': A3,
+    'A3+': (329 * mm, 483 * mm),
+    'A4': A4
+}
+
+# Tamanhos de placa: (folha, colunas, linhas); folha None usa a folha da configuração
+TAMANHOS = {
+    'A3': ('A3', 1, 1),
+    'A3+': ('A3+', 1, 1),
+    'A4': ('A4', 1, 1),
+    'A5': ('A4', 2, 1),  # 2 placas lado a lado em A4
+    'A6': ('A4', 2, 2),  # 4 placas em grid 2x2 em A4
+    '8-up': (None, 2, 4),
+    '16-up': (None, 4, 4)
+}
+
+# Menor placa das folhas originais (A6): placas menores têm o conteúdo reduzido para caber
+PLACA_REFERENCIA = (A4[0] / 2, A4[1] / 2)
+
+# Placa com largura e altura próprias (placa_largura_mm x placa_altura_mm), encaixada na folha
+PERSONALIZADO = 'personalizado'
+
+# Folga para divisões exatas (duas placas de meia folha) não perderem uma coluna no arredondamento
+_TOLERANCIA = 1e-6
+
+
+@dataclass(frozen=True, slots=True)
+class Imposicao:
+    """Grade de placas em uma folha"""
+    folha: tuple
+    placa_largura: float
+    placa_altura: float
+    colunas: int
+    linhas: int
+    rotacao: int  # 90 quando a placa é girada para caber mais na folha
+    sangria: float
+    posicoes: tuple  # origem de cada placa antes da rotação, de cima para baixo e da esquerda para a direita
+
+    @property
+    def placas_por_folha(self):
+        return self.colunas * self.linhas
+
+
+def _cabem(disponivel, celula):
+    return max(0, math.floor((disponivel + _TOLERANCIA) / celula))
+
+
+def _posicoes(folha, margem, colunas, linhas, largura, altura, sangria, rotacao):
+    celula_largura = largura + 2 * sangria
+    celula_altura = altura + 2 * sangria
+    # A grade fica centralizada na área útil
+    inicio_x = margem + (folha[0] - 2 * margem - colunas * celula_largura) / 2
+    inicio_y = margem + (folha[1] - 2 * margem - linhas * celula_altura) / 2
+
+    posicoes = []
+    for linha in range(linhas):
+        for coluna in range(colunas):
+            x = inicio_x + coluna * celula_largura + sangria
+            y = inicio_y + (linhas - 1 - linha) * celula_altura + sangria
+            # Girada 90°, a placa é desenhada com a base na borda direita da célula
+            posicoes.append((x + largura, y) if rotacao else (x, y))
+    return tuple(posicoes)
+
+
+def grade_fixa(folha, colunas, linhas, margem=0, sangria=0):
+    """Divide a área útil da folha em colunas x linhas placas iguais"""
+    largura = (folha[0] - 2 * margem) / colunas - 2 * sangria
+    altura = (folha[1] - 2 * margem) / linhas - 2 * sangria
+    if largura <= 0 or altura <= 0:
+        raise ValueError('Margem e sangria não deixam espaço para as placas')
+    return Imposicao(
+        folha=folha,
+        placa_largura=largura,
+        placa_altura=altura,
+        colunas=colunas,
+        linhas=linhas,
+        rotacao=0,
+        sangria=sangria,
+        posicoes=_posicoes(folha, margem, colunas, linhas, largura, altura, sangria, 0)
+    )
+
+
+def melhor_grade(folha, placa_largura, placa_altura, margem=0, sangria=0):
+    """Grade com mais placas de um tamanho dado na folha, testando a placa em pé e girada"""
+    util_largura = folha[0] - 2 * margem
+    util_altura = folha[1] - 2 * margem
+
+    melhor = None
+    for rotacao in (0, 90):
+        # Girada, a placa ocupa na folha a largura da sua altura e vice-versa
+        largura, altura = (placa_altura, placa_largura) if rotacao else (placa_largura, placa_altura)
+        colunas = _cabem(util_largura, largura + 2 * sangria)
+        linhas = _cabem(util_altura, altura + 2 * sangria)
+        # Em caso de empate fica a placa sem rotação
+        if colunas * linhas and (melhor is None or colunas * linhas > melhor[0] * melhor[1]):
+            melhor = (colunas, linhas, rotacao, largura, altura)
+
+    if melhor is None:
+        raise ValueError('A placa não cabe na folha com essa margem e sangria')
+    colunas, linhas, rotacao, largura, altura = melhor
+    return Imposicao(
+        folha=folha,
+        placa_largura=placa_largura,
+        placa_altura=placa_altura,
+        colunas=colunas,
+        linhas=linhas,
+        rotacao=rotacao,
+        sangria=sangria,
+        posicoes=_posicoes(folha, margem, colunas, linhas, largura, altura, sangria, rotacao)
+    )
+
+
+def imposicao(config):
+    """Imposição das placas descrita pela configuração (tamanho, folha, margem_mm, sangria_mm)"""
+    tamanho = config['tamanho']
+    margem = float(config.get('margem_mm', 0)) * mm
+    sangria = float(config.get('sangria_mm', 0)) * mm
+    if margem < 0 or sangria < 0:
+        raise ValueError('Margem e sangria não podem ser negativas')
+
+    if tamanho == PERSONALIZADO:
+        return melhor_grade(
+            _folha(config.get('folha', 'A4')),
+            float(config['placa_largura_mm']) * mm,
+            float(config['placa_altura_mm']) * mm,
+            margem, sangria
+        )
+    if tamanho not in TAMANHOS:
+        raise ValueError(f"Tamanho de placa desconhecido: {tamanho}")
+    folha, colunas, linhas = TAMANHOS[tamanho]
+    return grade_fixa(_folha(folha or config.get('folha', 'A4')), colunas, linhas, margem, sangria)
+
+
+def _folha(nome):
+    if nome not in FOLHAS:
+        raise ValueError(f"Folha desconhecida: {nome}")
+    return FOLHAS[nome]
@@ -0,0 +1,161 @@
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class IndiceLinhas:
+    """Posição em bytes de cada registro de um CSV, para ler só as linhas selecionadas"""
+
+    def __init__(self, inicios, fins, colunas, tipos):
+        self.inicios = inicios
+        self.fins = fins
+        self.colunas = colunas  # nomes já normalizados, na ordem do arquivo
+        self.tipos = tipos  # dtype de cada coluna na leitura do arquivo inteiro
+
+    @property
+    def total(self):
+        return len(self.inicios)
+
+    def ler(self, arquivo_path, posicoes):
+        """DataFrame só com as linhas pedidas, na ordem dada e com os mesmos índices e tipos de df.iloc[posicoes]"""
+        posicoes = np.asarray(posicoes, dtype=np.int64).reshape(-1)
+        if ((posicoes < -self.total) | (posicoes >= self.total)).any():
+            raise IndexError('positional indexers are out-of-bounds')
+        posicoes = np.where(posicoes < 0, posicoes + self.total, posicoes)
+        unicas = np.unique(posicoes)
+
+        registros = []
+        with open(arquivo_path, 'rb') as f:
+            for posicao in unicas:
+                f.seek(self.inicios[posicao])
+                registro = f.read(self.fins[posicao] - self.inicios[posicao])
+                registros.append(registro if registro.endswith(b'\n') else registro + b'\n')
+
+        # Tipos da leitura completa: uma seleção só de números não pode virar float numa coluna de texto
+        nomes = list(range(len(self.colunas)))
+        df = pd.read_csv(
+            io.BytesIO(b''.join(registros)), encoding='utf-8', header=None, names=nomes,
+            dtype=dict(zip(nomes, self.tipos))
+        ) if registros else pd.DataFrame({i: pd.Series(dtype=t) for i, t in zip(nomes, self.tipos)})
+        df.columns = self.colunas
+        df.index = unicas
+
+        if len(unicas) != len(posicoes) or (unicas != posicoes).any():
+            df = df.loc[posicoes]
+        return df
+
+
+def construir_indice(arquivo_path, colunas, tipos):
+    """Percorre o arquivo uma vez marcando onde cada registro começa e termina (aspas podem conter quebras de linha)"""
+    inicios = []
+    fins = []
+    with open(arquivo_path, 'rb') as f:
+        posicao = 0
+        aberto = True  # o cabeçalho também pode ter campos entre aspas
+        inicio = None
+        cabecalho = True
+        for linha in f:
+            if inicio is None:
+                # Linhas em branco entre registros são ignoradas, como no pandas
+                if not cabecalho and not linha.strip():
+                    posicao += len(linha)
+                    continue
+                inicio = posicao
+                aberto = False
+            if linha.count(b'"') % 2:
+                aberto = not aberto
+            posicao += len(linha)
+            if not aberto:
+                if cabecalho:
+                    cabecalho = False
+                else:
+                    inicios.append(inicio)
+                    fins.append(posicao)
+                inicio = None
+    return IndiceLinhas(
+        np.array(inicios, dtype=np.int64), np.array(fins, dtype=np.int64), list(colunas), [str(t) for t in tipos]
+    )
+
+
+def tipos_combinados(tipos_por_bloco):
+    """Um dtype por coluna para um arquivo lido em blocos (cada bloco infere os seus)"""
+    combinados = []
+    for tipos in zip(*tipos_por_bloco):
+        tipos = set(str(t) for t in tipos)
+        if len(tipos) == 1:
+            combinados.append(tipos.pop())
+        elif all(t.startswith(('int', 'float')) for t in tipos):
+            combinados.append('float64')
+        else:
+            combinados.append('object')
+    return combinados
+
+
+class CacheIndices:
+    """Índices de linhas em memória e gravados ao lado do arquivo, para valerem em todos os processos"""
+
+    def __init__(self, max_itens=64):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _assinatura(self, arquivo_path):
+        info = os.stat(arquivo_path)
+        return info.st_mtime_ns, info.st_size
+
+    def _caminho_indice(self, arquivo_path):
+        return arquivo_path + '.indice.npz'
+
+    def obter(self, arquivo_path):
+        """Índice do arquivo ou None se ainda não foi construído (ou o arquivo mudou)"""
+        chave = os.path.abspath(arquivo_path)
+        assinatura = self._assinatura(arquivo_path)
+        with self._lock:
+            entrada = self._itens.get(chave)
+            if entrada and entrada[0] == assinatura:
+                self._itens.move_to_end(chave)
+                return entrada[1]
+
+        try:
+            with np.load(self._caminho_indice(arquivo_path), allow_pickle=False) as dados:
+                meta = json.loads(str(dados['meta']))
+                if tuple(meta['assinatura']) != assinatura:
+                    return None
+                indice = IndiceLinhas(dados['inicios'], dados['fins'], meta['colunas'], meta['tipos'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+        self._guardar_memoria(chave, assinatura, indice)
+        return indice
+
+    def guardar(self, arquivo_path, colunas, tipos):
+        """Constrói o índice a partir das colunas e tipos de uma leitura completa e o grava em disco"""
+        assinatura = self._assinatura(arquivo_path)
+        indice = construir_indice(arquivo_path, colunas, tipos)
+        meta = {'assinatura': list(assinatura), 'colunas': indice.colunas, 'tipos': indice.tipos}
+
+        destino = self._caminho_indice(arquivo_path)
+        temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        try:
+            np.savez(temporario, inicios=indice.inicios, fins=indice.fins, meta=np.array(json.dumps(meta)))
+            os.replace(temporario, destino)
+        except OSError as e:
+            print(f"Erro ao gravar índice de linhas: {e}")
+
+        self._guardar_memoria(os.path.abspath(arquivo_path), assinatura, indice)
+        return indice
+
+    def _guardar_memoria(self, chave, assinatura, indice):
+        with self._lock:
+            self._itens[chave] = (assinatura, indice)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+
+cache_indices = CacheIndices()
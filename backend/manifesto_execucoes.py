@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+from werkzeug.utils import secure_filename
+
+from plano_layout import chave_layout
+from validacao import coluna
+
+
+def identidades(df):
+    """Identidade de cada produto: o código de barras ou, sem um EAN válido, o nome"""
+    nomes = coluna(df, 'Nome do produto', '').astype(str)
+    codigos = coluna(df, 'Codigo de Barras', '').astype(str)
+    return [
+        codigo if len(codigo) == 13 and codigo.isdigit() else 'nome:' + nome.strip().lower()
+        for nome, codigo in zip(nomes, codigos)
+    ]
+
+
+def impressoes(df):
+    """Impressão digital de cada produto, feita dos quatro campos"""
+    nomes = coluna(df, 'Nome do produto', '').astype(str)
+    precos = coluna(df, 'Preço', '').astype(str)
+    datas = coluna(df, 'Data da Oferta', '').astype(str)
+    codigos = coluna(df, 'Codigo de Barras', '').astype(str)
+    return [
+        hashlib.blake2b('\x1f'.join(campos).encode('utf-8'), digest_size=10).hexdigest()
+        for campos in zip(nomes, precos, datas, codigos)
+    ]
+
+
+class RepositorioManifestos:
+    """Manifestos das últimas gerações (um JSON por nome, normalmente a loja)"""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta, secure_filename(nome + '.json'))
+
+    def ler(self, nome):
+        try:
+            with open(self.caminho(nome), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def gravar(self, nome, manifesto):
+        path = self.caminho(nome)
+        temporario = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False)
+        os.replace(temporario, path)
+
+
+class ExecucaoDelta:
+    """Compara os produtos válidos de uma geração com o manifesto anterior e grava o novo ao concluir"""
+
+    def __init__(self, repositorio, nome, config, somente_alterados=True, produtos_selecionados=None):
+        self.repositorio = repositorio
+        self.nome = nome
+        self.layout = chave_layout(config)
+        self.somente_alterados = somente_alterados
+        # Com seleção de produtos, o manifesto é atualizado; com o arquivo inteiro, substituído
+        self.selecionados = None if produtos_selecionados is None else set(produtos_selecionados)
+        anterior = repositorio.ler(nome)
+        self._anteriores = anterior['produtos'] if anterior and anterior.get('layout') == self.layout else {}
+        self._vistos = {}
+        self._ocorrencias = {}
+        self._identidades = {}  # posição no arquivo -> identidade numerada
+        self.inalterados = 0
+
+    @property
+    def parcial(self):
+        return self.selecionados is not None
+
+    def numerar(self, bloco):
+        """Numera as ocorrências repetidas de um bloco do arquivo, lido na ordem e antes de qualquer filtro"""
+        if self.selecionados is None:
+            # Com o arquivo inteiro, cada bloco é numerado e filtrado em seguida: os anteriores já foram usados
+            self._identidades.clear()
+        for posicao, identidade in zip(bloco.index, identidades(bloco)):
+            # O mesmo produto pode aparecer mais de uma vez no arquivo: cada ocorrência tem sua entrada
+            ocorrencia = self._ocorrencias.get(identidade, 0)
+            self._ocorrencias[identidade] = ocorrencia + 1
+            if self.selecionados is None or posicao in self.selecionados:
+                self._identidades[posicao] = f"{identidade}#{ocorrencia}" if ocorrencia else identidade
+
+    def filtrar(self, bloco):
+        """Registra as impressões do bloco (já numerado) e, no modo delta, devolve só os produtos novos ou alterados"""
+        alterados = np.ones(len(bloco), dtype=bool)
+        for pos, (posicao, digital) in enumerate(zip(bloco.index, impressoes(bloco))):
+            identidade = self._identidades[posicao]
+            self._vistos[identidade] = digital
+            if self._anteriores.get(identidade) == digital:
+                alterados[pos] = False
+
+        if not self.somente_alterados:
+            return bloco
+        self.inalterados += int((~alterados).sum())
+        return bloco[alterados]
+
+    def concluir(self, relatorio=None):
+        """Grava o manifesto desta geração (chamado só depois que o PDF foi gerado)"""
+        produtos = dict(self._anteriores) if self.parcial else {}
+        produtos.update(self._vistos)
+        self.repositorio.gravar(self.nome, {
+            'layout': self.layout,
+            'atualizado_em': datetime.now().isoformat(),
+            'produtos': produtos
+        })
+        if relatorio is not None and self.somente_alterados:
+            relatorio['produtos_inalterados'] = self.inalterados
@@ -0,0 +1,125 @@
+import threading
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+
+RETICENCIAS = '...'
+
+# Caracteres medidos no aquecimento: ASCII imprimível e acentos do português
+CARACTERES_COMUNS = ''.join(chr(c) for c in range(32, 127)) + 'ÁÂÃÀÇÉÊÍÓÔÕÚÜáâãàçéêíóôõúü'
+
+
+class MedidorTexto:
+    """Mede, quebra e trunca textos com as métricas reais das fontes, guardando os resultados"""
+
+    def __init__(self, max_layouts=8192):
+        self._larguras = {}  # fonte -> {caractere: largura em 1/1000 do tamanho}
+        self._lock = threading.Lock()
+        self.quebrar = lru_cache(maxsize=max_layouts)(self._quebrar)
+        self.truncar = lru_cache(maxsize=max_layouts)(self._truncar)
+
+    def _tabela(self, fonte):
+        tabela = self._larguras.get(fonte)
+        if tabela is None:
+            with self._lock:
+                tabela = self._larguras.setdefault(fonte, {})
+        return tabela
+
+    def largura(self, texto, fonte, tamanho):
+        """Largura do texto em pontos, somando as larguras dos glifos da fonte"""
+        tabela = self._tabela(fonte)
+        total = 0.0
+        for caractere in texto:
+            largura = tabela.get(caractere)
+            if largura is None:
+                largura = pdfmetrics.stringWidth(caractere, fonte, 1000)
+                tabela[caractere] = largura
+            total += largura
+        return total * tamanho / 1000.0
+
+    def _partir_palavra(self, palavra, fonte, tamanho, largura_maxima):
+        # Divide uma palavra maior que a linha em pedaços que cabem
+        pedacos = []
+        atual = ''
+        for caractere in palavra:
+            if atual and self.largura(atual + caractere, fonte, tamanho) > largura_maxima:
+                pedacos.append(atual)
+                atual = caractere
+            else:
+                atual += caractere
+        if atual:
+            pedacos.append(atual)
+        return pedacos
+
+    def _quebrar(self, texto, fonte, tamanho, largura_maxima):
+        """Quebra o texto em linhas que cabem na largura (tupla de linhas)"""
+        largura_espaco = self.largura(' ', fonte, tamanho)
+        linhas = []
+        linha_atual = ''
+        largura_atual = 0.0
+
+        for palavra in texto.split():
+            largura_palavra = self.largura(palavra, fonte, tamanho)
+            if not linha_atual:
+                largura_teste = largura_palavra
+            else:
+                largura_teste = largura_atual + largura_espaco + largura_palavra
+
+            if largura_teste <= largura_maxima:
+                linha_atual = f"{linha_atual} {palavra}" if linha_atual else palavra
+                largura_atual = largura_teste
+                continue
+
+            if linha_atual:
+                linhas.append(linha_atual)
+            linha_atual = palavra
+            largura_atual = largura_palavra
+
+            # Se uma palavra individual for muito longa, quebra ela
+            if largura_palavra > largura_maxima:
+                linhas.extend(self._partir_palavra(palavra, fonte, tamanho, largura_maxima))
+                linha_atual = ''
+                largura_atual = 0.0
+
+        if linha_atual:
+            linhas.append(linha_atual)
+        return tuple(linhas)
+
+    def _truncar(self, texto, fonte, tamanho, largura_maxima):
+        """Corta o texto com reticências quando ele não cabe na largura"""
+        if self.largura(texto, fonte, tamanho) <= largura_maxima:
+            return texto
+
+        disponivel = largura_maxima - self.largura(RETICENCIAS, fonte, tamanho)
+        fim = 0
+        acumulado = 0.0
+        for caractere in texto:
+            acumulado += self.largura(caractere, fonte, tamanho)
+            if acumulado > disponivel:
+                break
+            fim += 1
+        return texto[:fim].rstrip() + RETICENCIAS
+
+    def aquecer(self, fonte):
+        """Preenche a tabela de larguras da fonte com os caracteres mais comuns"""
+        self.largura(CARACTERES_COMUNS, fonte, 1)
+
+    def invalidar(self, fonte=None):
+        """Descarta as métricas (de uma fonte ou de todas) e os layouts guardados"""
+        with self._lock:
+            if fonte is None:
+                self._larguras.clear()
+            else:
+                self._larguras.pop(fonte, None)
+        self.quebrar.cache_clear()
+        self.truncar.cache_clear()
+
+    def estatisticas(self):
+        return {
+            'fontes': len(self._larguras),
+            'quebras': self.quebrar.cache_info()._asdict(),
+            'truncamentos': self.truncar.cache_info()._asdict()
+        }
+
+
+medidor_texto = MedidorTexto()
@@ -0,0 +1,123 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Limites (em segundos) dos baldes dos histogramas
+BALDES_PADRAO = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _rotulos(rotulos):
+    return tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+
+def _formatar_rotulos(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ''
+    texto = ','.join(
+        '{}="{}"'.format(chave, valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for chave, valor in pares
+    )
+    return '{' + texto + '}'
+
+
+class Metricas:
+    """Contadores, histogramas de tempo e medidores exportados no formato texto do Prometheus"""
+
+    def __init__(self, baldes=BALDES_PADRAO):
+        self.baldes = tuple(baldes)
+        self._descricoes = {}
+        self._contadores = {}  # (nome, rótulos) -> valor
+        self._histogramas = {}  # (nome, rótulos) -> [contagens por balde, soma, total]
+        self._medidores = {}  # nome -> função que retorna {rótulos: valor}
+        self._lock = threading.Lock()
+
+    def descrever(self, nome, descricao):
+        self._descricoes[nome] = descricao
+
+    def contar(self, nome, valor=1, **rotulos):
+        chave = (nome, _rotulos(rotulos))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, segundos, **rotulos):
+        chave = (nome, _rotulos(rotulos))
+        posicao = bisect_left(self.baldes, segundos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = [[0] * (len(self.baldes) + 1), 0.0, 0]
+            histograma[0][posicao] += 1
+            histograma[1] += segundos
+            histograma[2] += 1
+
+    @contextmanager
+    def cronometrar(self, nome, **rotulos):
+        """Observa no histograma o tempo gasto dentro do bloco"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def medidor(self, nome, funcao, descricao=None):
+        """Registra um valor calculado na hora da exportação: funcao() -> {dict de rótulos: valor}"""
+        self._medidores[nome] = funcao
+        if descricao:
+            self.descrever(nome, descricao)
+
+    def _cabecalho(self, linhas, nome, tipo):
+        if nome in self._descricoes:
+            linhas.append(f"# HELP {nome} {self._descricoes[nome]}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {chave: (list(h[0]), h[1], h[2]) for chave, h in self._histogramas.items()}
+
+        linhas = []
+        vistos = set()
+        for (nome, rotulos), valor in sorted(contadores.items()):
+            if nome not in vistos:
+                vistos.add(nome)
+                self._cabecalho(linhas, nome, 'counter')
+            linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {valor}")
+
+        for (nome, rotulos), (contagens, soma, total) in sorted(histogramas.items()):
+            if nome not in vistos:
+                vistos.add(nome)
+                self._cabecalho(linhas, nome, 'histogram')
+            acumulado = 0
+            for limite, contagem in zip(self.baldes + ('+Inf',), contagens):
+                acumulado += contagem
+                linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, [('le', str(limite))])} {acumulado}")
+            linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {soma}")
+            linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {total}")
+
+        for nome, funcao in sorted(self._medidores.items()):
+            try:
+                valores = funcao()
+            except Exception as e:
+                print(f"Erro ao calcular a métrica {nome}: {e}")
+                continue
+            self._cabecalho(linhas, nome, 'gauge')
+            for rotulos, valor in valores.items():
+                linhas.append(f"{nome}{_formatar_rotulos(_rotulos(dict(rotulos)))} {valor}")
+
+        return '\n'.join(linhas) + '\n'
+
+    def limpar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+
+metricas = Metricas()
+metricas.descrever('placas_etapa_segundos', 'Tempo gasto em cada etapa da geração de placas')
+metricas.descrever('placas_etapa_total', 'Quantidade de itens processados em cada etapa')
+metricas.descrever('placas_http_requisicao_segundos', 'Latência das requisições por endpoint')
+metricas.descrever('placas_http_requisicoes_total', 'Requisições por endpoint, método e status')
+metricas.descrever('placas_fragmentos_total', 'Placas copiadas do cache de fragmentos (acerto) ou desenhadas (falha)')
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Opções que mudam como o PDF é gerado, mas não a aparência das placas
+# (workers_renderizacao de perfis antigos é ignorada: só PLACAS_WORKERS_RENDERIZACAO define os processos)
+CHAVES_EXECUCAO = ('workers_renderizacao', 'leitura_em_blocos', 'cache_fragmentos')
+
+
+@dataclass(frozen=True, slots=True)
+class EstiloElemento:
+    """Configuração resolvida de um elemento de texto (nome, valor, data ou código)"""
+    visivel: bool
+    fonte: str
+    tamanho: float
+    cor: tuple  # (r, g, b) entre 0 e 1, ou None para manter a cor atual
+    largura: float
+    x: float
+    espacamento: float
+
+
+@dataclass(frozen=True, slots=True)
+class PlanoLayout:
+    """Tudo o que o desenho de uma placa precisa, calculado uma vez por configuração"""
+    chave: str
+    tamanho: str
+    page_size: tuple
+    placas_por_pagina: int
+    placa_largura: float  # medidas da placa no desenho, antes da escala
+    placa_altura: float
+    posicoes: tuple  # (x, y) de cada placa dentro da página
+    rotacao: int  # 90 quando as placas são giradas na folha
+    escala: float  # menor que 1 quando a placa é menor que a de referência
+    sangria: float  # área além da placa coberta pelo fundo
+    fundo: str  # None sem fundo personalizado
+    bordas: bool
+    nome: EstiloElemento
+    valor: EstiloElemento
+    data: EstiloElemento
+    codigo: EstiloElemento
+    usar_imagem_codigo: bool
+    codigo_largura_imagem: float
+    codigo_altura_imagem: float
+
+
+def cor_rgb(cor):
+    """Converte '#RRGGBB' em (r, g, b) entre 0 e 1; outros valores retornam None"""
+    if not cor.startswith('#'):
+        return None
+    return (int(cor[1:3], 16) / 255.0, int(cor[3:5], 16) / 255.0, int(cor[5:7], 16) / 255.0)
+
+
+def chave_config(config):
+    """Hash estável do conteúdo da configuração"""
+    texto = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:32]
+
+
+def chave_layout(config):
+    """Hash da configuração sem as opções de execução: se muda, todas as placas precisam ser refeitas"""
+    return chave_config({k: v for k, v in config.items() if k not in CHAVES_EXECUCAO})
+
+
+class CachePlanos:
+    """Planos compilados por configuração e configurações lidas dos perfis salvos"""
+
+    def __init__(self, max_planos=64):
+        self.max_planos = max_planos
+        self._planos = OrderedDict()
+        self._perfis = {}  # caminho -> (mtime_ns, config)
+        self._lock = threading.Lock()
+
+    def obter(self, chave, compilar):
+        """Retorna o plano da chave, compilando-o com compilar() na primeira vez"""
+        with self._lock:
+            plano = self._planos.get(chave)
+            if plano is not None:
+                self._planos.move_to_end(chave)
+                return plano
+
+        plano = compilar()
+        with self._lock:
+            self._planos[chave] = plano
+            while len(self._planos) > self.max_planos:
+                self._planos.popitem(last=False)
+        return plano
+
+    def config_perfil(self, path):
+        """Configuração de um perfil salvo, relida apenas quando o arquivo muda (None se não existe)"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            entrada = self._perfis.get(path)
+            if entrada and entrada[0] == mtime:
+                return entrada[1]
+
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f).get('config') or {}
+        with self._lock:
+            self._perfis[path] = (mtime, config)
+        return config
+
+    def invalidar(self):
+        with self._lock:
+            self._planos.clear()
+            self._perfis.clear()
+
+
+cache_planos = CachePlanos()
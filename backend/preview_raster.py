@@ -0,0 +1,85 @@
+import io
+import math
+import os
+import threading
+
+from PIL import Image
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # sem pypdfium2 o preview volta a ser a aproximação desenhada com PIL
+    pdfium = None
+
+# Resolução do preview de uma placa e das miniaturas da folha de contatos
+DPI_PREVIEW = int(os.environ.get('PLACAS_PREVIEW_DPI', 96))
+DPI_MINIATURA = int(os.environ.get('PLACAS_MINIATURA_DPI', 24))
+DPI_MINIMO = 10
+DPI_MAXIMO = 300
+
+# Produtos por folha de contatos
+MAX_PREVIEW_LOTE = int(os.environ.get('PLACAS_MAX_PREVIEW_LOTE', 200))
+
+# Soma dos pixels das miniaturas de uma folha de contatos (limita a memória de DPI alto com muitas placas)
+MAX_PIXELS_FOLHA = int(os.environ.get('PLACAS_MAX_PIXELS_FOLHA', 50_000_000))
+
+# Espaço entre as miniaturas, em pixels
+ESPACO_MINIATURAS = 8
+
+# O pdfium não pode ser usado por duas threads ao mesmo tempo
+_lock_pdfium = threading.Lock()
+
+
+def disponivel():
+    return pdfium is not None
+
+
+def dpi_valido(dpi, padrao):
+    """DPI pedido limitado a [DPI_MINIMO, DPI_MAXIMO]; None usa o padrão"""
+    if dpi is None:
+        return padrao
+    return min(max(int(dpi), DPI_MINIMO), DPI_MAXIMO)
+
+
+def pixels(largura, altura, dpi):
+    """Pixels da imagem de uma página de largura x altura pontos na resolução pedida"""
+    escala = dpi / 72
+    return math.ceil(largura * escala) * math.ceil(altura * escala)
+
+
+def rasterizar(pdf, dpi):
+    """Imagens RGB de todas as páginas do PDF (bytes) na resolução pedida"""
+    escala = dpi / 72
+    with _lock_pdfium:
+        documento = pdfium.PdfDocument(pdf)
+        try:
+            return [documento[i].render(scale=escala).to_pil().convert('RGB') for i in range(len(documento))]
+        finally:
+            documento.close()
+
+
+def folha_contatos(miniaturas, colunas=None):
+    """Junta as miniaturas em uma grade (quase quadrada se colunas for None)"""
+    if not miniaturas:
+        raise ValueError('Nenhuma miniatura para a folha de contatos')
+    colunas = max(1, min(colunas or math.ceil(math.sqrt(len(miniaturas))), len(miniaturas)))
+    linhas = math.ceil(len(miniaturas) / colunas)
+    largura = max(img.width for img in miniaturas)
+    altura = max(img.height for img in miniaturas)
+
+    folha = Image.new(
+        'RGB',
+        (colunas * (largura + ESPACO_MINIATURAS) + ESPACO_MINIATURAS,
+         linhas * (altura + ESPACO_MINIATURAS) + ESPACO_MINIATURAS),
+        color='#d9d9d9'
+    )
+    for i, img in enumerate(miniaturas):
+        x = ESPACO_MINIATURAS + (i % colunas) * (largura + ESPACO_MINIATURAS)
+        y = ESPACO_MINIATURAS + (i // colunas) * (altura + ESPACO_MINIATURAS)
+        folha.paste(img, (x, y))
+    return folha
+
+
+def png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from medidas_texto import medidor_texto
+
+FONTES_PADRAO = ['Helvetica-Bold', 'Courier', 'Times-Roman']
+
+
+class RegistroRecursos:
+    """Fontes TTF e imagens de fundo carregadas uma única vez por processo"""
+
+    # Intervalo mínimo entre verificações de alteração do mesmo arquivo
+    INTERVALO_VERIFICACAO = 1.0
+
+    def __init__(self, max_fundos=16):
+        self.max_fundos = max_fundos
+        self._fontes = {}
+        self._fundos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _assinatura(self, path):
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        return (info.st_mtime_ns, info.st_size)
+
+    def _atual(self, entrada, path):
+        """Confere se a entrada ainda corresponde ao arquivo em disco"""
+        agora = time.monotonic()
+        if agora - entrada['verificado_em'] < self.INTERVALO_VERIFICACAO:
+            return True
+        if self._assinatura(path) != entrada['assinatura']:
+            return False
+        entrada['verificado_em'] = agora
+        return True
+
+    def fonte(self, base_path, nome):
+        """Registra a fonte TTF de assets/fonts (se ainda não registrada) e retorna seu nome, ou None"""
+        path = os.path.join(base_path, 'assets', 'fonts', f"{nome}.ttf")
+
+        with self._lock:
+            entrada = self._fontes.get(path)
+            if entrada and self._atual(entrada, path):
+                return nome
+
+            assinatura = self._assinatura(path)
+            if assinatura is None:
+                self._fontes.pop(path, None)
+                return None
+
+            pdfmetrics.registerFont(TTFont(nome, path))
+            # Métricas guardadas com a versão anterior do arquivo deixam de valer
+            medidor_texto.invalidar(nome)
+            self._fontes[path] = {'assinatura': assinatura, 'verificado_em': time.monotonic()}
+            return nome
+
+    def assinatura_fonte(self, base_path, nome):
+        """(mtime, tamanho) do arquivo TTF da fonte, ou None para fontes padrão e arquivos ausentes"""
+        if not nome or nome in FONTES_PADRAO:
+            return None
+        return self._assinatura(os.path.join(base_path, 'assets', 'fonts', f"{nome}.ttf"))
+
+    def assinatura_fundo(self, base_path, arquivo):
+        """(mtime, tamanho) da imagem de fundo, ou None se ela não existir"""
+        return self._assinatura(os.path.join(base_path, 'assets', 'backgrounds', arquivo))
+
+    def fundo(self, base_path, arquivo):
+        """Retorna (ImageReader já decodificado, chave) do fundo de assets/backgrounds, ou None"""
+        path = os.path.join(base_path, 'assets', 'backgrounds', arquivo)
+
+        with self._lock:
+            entrada = self._fundos.get(path)
+            if entrada and self._atual(entrada, path):
+                self._fundos.move_to_end(path)
+                return entrada['imagem'], entrada['chave']
+
+            assinatura = self._assinatura(path)
+            if assinatura is None:
+                self._fundos.pop(path, None)
+                return None
+
+            imagem = ImageReader(path)
+            # Decodifica agora para que as threads compartilhem a imagem pronta
+            imagem.getRGBData()
+            chave = hashlib.md5(f"{path}:{assinatura}".encode('utf-8')).hexdigest()[:16]
+
+            self._fundos[path] = {
+                'assinatura': assinatura,
+                'verificado_em': time.monotonic(),
+                'imagem': imagem,
+                'chave': chave
+            }
+            while len(self._fundos) > self.max_fundos:
+                self._fundos.popitem(last=False)
+            return imagem, chave
+
+    def invalidar(self):
+        with self._lock:
+            self._fontes.clear()
+            self._fundos.clear()
+
+
+registro_recursos = RegistroRecursos()
@@ -0,0 +1,169 @@
+import hashlib
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+from pypdf import PdfWriter
+from pypdf.generic import IndirectObject, NameObject
+
+# Número de processos de renderização (1 = renderização sequencial), definido só pelo servidor
+WORKERS_RENDERIZACAO = max(1, min(int(os.environ.get('PLACAS_WORKERS_RENDERIZACAO', 1)), os.cpu_count() or 1))
+
+# Quantas partes por processo, para equilibrar partes que demoram mais
+PARTES_POR_WORKER = 4
+
+# Abaixo disso, miniaturas são rasterizadas no próprio processo (enviar ao pool custaria mais)
+MIN_MINIATURAS_POR_PARTE = 32
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Gerador de cada processo filho, reaproveitado entre as partes que ele renderiza
+_geradores = {}
+
+
+def _obter_pool():
+    """Reaproveita o mesmo pool de processos entre execuções"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: não herda threads/locks do servidor (fork em processo com threads é arriscado)
+            _pool = ProcessPoolExecutor(WORKERS_RENDERIZACAO, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _gerador(base_path):
+    from gerador_placas import GeradorPlacas
+
+    if base_path not in _geradores:
+        _geradores[base_path] = GeradorPlacas(base_path)
+    return _geradores[base_path]
+
+
+def _renderizar_parte(base_path, produtos, output_file, config):
+    """Executado no processo filho: renderiza uma parte das placas em um PDF próprio"""
+    _gerador(base_path).gerar_pdf(produtos, output_file, config)
+    return len(produtos)
+
+
+def _miniaturas_parte(base_path, produtos, config, dpi):
+    """Executado no processo filho: rasteriza as placas de uma parte da folha de contatos"""
+    return [(img.size, img.tobytes()) for img in _gerador(base_path).miniaturas(produtos, config, dpi)]
+
+
+def miniaturas_paralelas(gerador, produtos, config, dpi):
+    """Miniaturas das placas na ordem dos produtos, divididas entre os processos do pool quando compensa"""
+    partes = min(WORKERS_RENDERIZACAO, len(produtos) // MIN_MINIATURAS_POR_PARTE)
+    if partes <= 1:
+        return gerador.miniaturas(produtos, config, dpi)
+
+    pool = _obter_pool()
+    passo = math.ceil(len(produtos) / partes)
+    futures = [
+        pool.submit(_miniaturas_parte, gerador.base_path, produtos[inicio:inicio + passo], config, dpi)
+        for inicio in range(0, len(produtos), passo)
+    ]
+    try:
+        return [Image.frombytes('RGB', tamanho, dados) for future in futures for tamanho, dados in future.result()]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def dividir_em_partes(total, placas_por_pagina, workers):
+    """Divide [0, total) em intervalos que começam sempre no início de uma página"""
+    paginas = math.ceil(total / placas_por_pagina)
+    paginas_por_parte = max(1, math.ceil(paginas / (workers * PARTES_POR_WORKER)))
+    passo = paginas_por_parte * placas_por_pagina
+    return [(inicio, min(inicio + passo, total)) for inicio in range(0, total, passo)]
+
+
+def _unificar_xobjects(writer):
+    """Faz todas as páginas usarem uma única cópia de cada imagem ou form idêntico (cada parte traz o seu fundo)"""
+    canonicos = {}  # resumo do conteúdo -> referência mantida
+    trocas = {}  # idnum -> referência mantida
+
+    def unificar_recursos(objeto):
+        recursos = objeto.get('/Resources')
+        xobjects = recursos.get_object().get('/XObject') if recursos is not None else None
+        if xobjects is None:
+            return
+        xobjects = xobjects.get_object()
+        for nome, ref in list(xobjects.items()):
+            if isinstance(ref, IndirectObject):
+                xobjects[NameObject(nome)] = unificar(ref)
+
+    def unificar(ref):
+        if ref.idnum in trocas:
+            return trocas[ref.idnum]
+        objeto = ref.get_object()
+        # Forms primeiro apontam para as imagens já unificadas, então forms iguais ficam com o mesmo resumo
+        unificar_recursos(objeto)
+        resumo = hashlib.sha256(objeto.get_data())
+        for chave in sorted(objeto):
+            if chave == '/Length':
+                continue
+            valor = objeto[chave]
+            if isinstance(valor, IndirectObject) and hasattr(valor.get_object(), 'get_data'):
+                # Outros streams referenciados (a máscara /SMask de um PNG transparente)
+                valor = objeto[NameObject(chave)] = unificar(valor)
+            resumo.update(f"{chave}={valor.idnum if isinstance(valor, IndirectObject) else valor!r}".encode('utf-8'))
+        trocas[ref.idnum] = canonicos.setdefault(resumo.hexdigest(), ref)
+        return trocas[ref.idnum]
+
+    for pagina in writer.pages:
+        unificar_recursos(pagina)
+
+    # As cópias sem referência ficam de fora ao copiar as páginas para um PDF novo
+    final = PdfWriter()
+    for pagina in writer.pages:
+        final.add_page(pagina)
+    return final
+
+
+def gerar_pdf_paralelo(gerador, produtos, output_file, config, progresso=None):
+    """Renderiza as placas em vários processos e junta as partes na ordem original"""
+    partes = dividir_em_partes(
+        len(produtos), gerador.plano_layout(config).placas_por_pagina, WORKERS_RENDERIZACAO
+    )
+
+    if len(partes) == 1:
+        gerador.gerar_pdf(produtos, output_file, config, progresso)
+        return
+
+    pool = _obter_pool()
+    pasta_temp = tempfile.mkdtemp(prefix='partes_', dir=os.path.dirname(output_file))
+    arquivos = [os.path.join(pasta_temp, f'parte_{i:05d}.pdf') for i in range(len(partes))]
+    futures = []
+
+    try:
+        for (inicio, fim), arquivo in zip(partes, arquivos):
+            futures.append(pool.submit(
+                _renderizar_parte, gerador.base_path, produtos.iloc[inicio:fim], arquivo, config
+            ))
+
+        renderizadas = 0
+        for future in as_completed(futures):
+            renderizadas += future.result()
+            if progresso:
+                progresso(renderizadas, len(produtos))
+
+        # Juntar as partes na ordem original
+        writer = PdfWriter()
+        for arquivo in arquivos:
+            writer.append(arquivo)
+        writer = _unificar_xobjects(writer)
+        with open(output_file, 'wb') as f:
+            writer.write(f)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        shutil.rmtree(pasta_temp, ignore_errors=True)
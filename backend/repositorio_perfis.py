@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+
+
+class RepositorioPerfis:
+    """Perfis salvos em JSON com um índice de metadados em memória, relido só para os arquivos que mudaram"""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self._indice = {}  # arquivo -> (mtime_ns, tamanho, metadados)
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta, secure_filename(nome + '.json'))
+
+    def _metadados(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            perfil = json.load(f)
+        config = perfil.get('config') or {}
+        return {
+            'nome': perfil.get('nome'),
+            'criado_em': perfil.get('criado_em'),
+            'atualizado_em': perfil.get('atualizado_em', perfil.get('criado_em')),
+            'tamanho': config.get('tamanho')
+        }
+
+    def _atualizar_indice(self):
+        """Confere o mtime de cada arquivo (sem abri-lo) e relê só os novos ou alterados"""
+        vistos = {}
+        with os.scandir(self.pasta) as entradas:
+            for entrada in entradas:
+                if entrada.name.endswith('.json') and entrada.is_file():
+                    info = entrada.stat()
+                    vistos[entrada.name] = (info.st_mtime_ns, info.st_size)
+
+        with self._lock:
+            for arquivo in list(self._indice):
+                if arquivo not in vistos:
+                    del self._indice[arquivo]
+            alterados = [
+                arquivo for arquivo, assinatura in vistos.items()
+                if self._indice.get(arquivo, (None, None))[:2] != assinatura
+            ]
+
+        for arquivo in alterados:
+            try:
+                metadados = self._metadados(os.path.join(self.pasta, arquivo))
+            except (OSError, ValueError) as e:
+                print(f"Erro ao ler perfil {arquivo}: {e}")
+                continue
+            with self._lock:
+                self._indice[arquivo] = vistos[arquivo] + (metadados,)
+
+        with self._lock:
+            return sorted(self._indice.items(), key=lambda item: (item[1][2]['nome'] or '').lower())
+
+    def listar(self, offset=0, limite=None):
+        """(metadados da página, total, etag); o etag muda quando qualquer perfil muda"""
+        indice = self._atualizar_indice()
+        assinatura = hashlib.sha256()
+        for arquivo, (mtime, tamanho, _) in indice:
+            assinatura.update(f"{arquivo}:{mtime}:{tamanho};".encode('utf-8'))
+        assinatura.update(f"{offset}:{limite}".encode('utf-8'))
+
+        fim = None if limite is None else offset + limite
+        pagina = [metadados for _, (_, _, metadados) in indice[offset:fim]]
+        return pagina, len(indice), assinatura.hexdigest()[:32]
+
+    def obter(self, nome):
+        """(perfil completo, etag) ou (None, None) se não existe"""
+        path = self.caminho(nome)
+        try:
+            with open(path, 'rb') as f:
+                conteudo = f.read()
+        except OSError:
+            return None, None
+        return json.loads(conteudo.decode('utf-8')), hashlib.sha256(conteudo).hexdigest()[:32]
+
+    def salvar(self, nome, config):
+        """Grava o perfil de forma atômica, mantendo a data de criação se ele já existia"""
+        path = self.caminho(nome)
+        agora = datetime.now().isoformat()
+        existente, _ = self.obter(nome)
+        perfil = {
+            'nome': nome,
+            'config': config,
+            'criado_em': existente.get('criado_em', agora) if existente else agora,
+            'atualizado_em': agora
+        }
+
+        temporario = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(perfil, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, path)
+        return perfil
+
+    def excluir(self, nome):
+        try:
+            os.remove(self.caminho(nome))
+        except FileNotFoundError:
+            return False
+        return True
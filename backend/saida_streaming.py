@@ -0,0 +1,75 @@
+import io
+import json
+import zipfile
+
+import pandas as pd
+
+# Páginas em cada PDF do ZIP (cada parte é enviada assim que termina)
+PAGINAS_POR_PARTE = 10
+
+
+class _SaidaParcial(io.RawIOBase):
+    """Destino de escrita não posicionável cujo conteúdo é retirado aos pedaços"""
+
+    def __init__(self):
+        self._pedacos = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._pedacos.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self):
+        dados = b''.join(self._pedacos)
+        self._pedacos = []
+        return dados
+
+
+def gerar_zip_em_partes(gerador, arquivo_path, config, produtos_selecionados=None, paginas_por_parte=PAGINAS_POR_PARTE,
+                        delta=None):
+    """Gera um ZIP com um PDF a cada N páginas, entregando os bytes conforme as partes ficam prontas"""
+    placas_por_parte = max(1, paginas_por_parte) * gerador.plano_layout(config).placas_por_pagina
+
+    saida = _SaidaParcial()
+    relatorio = gerador.novo_relatorio()
+    # PDFs já são comprimidos: armazenar sem recompressão
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_STORED) as arquivo_zip:
+        numero_parte = 0
+        pendentes = []
+        quantidade = 0
+
+        def escrever_parte():
+            nonlocal numero_parte, pendentes, quantidade
+            numero_parte += 1
+            pdf = io.BytesIO()
+            gerador.gerar_pdf(pd.concat(pendentes), pdf, config)
+            arquivo_zip.writestr(f'placas_{numero_parte:04d}.pdf', pdf.getvalue())
+            pendentes = []
+            quantidade = 0
+
+        blocos = gerador.produtos_validos_em_blocos(arquivo_path, produtos_selecionados, relatorio, delta=delta)
+        for bloco in blocos:
+            inicio = 0
+            while inicio < len(bloco):
+                fatia = bloco.iloc[inicio:inicio + placas_por_parte - quantidade]
+                pendentes.append(fatia)
+                quantidade += len(fatia)
+                inicio += len(fatia)
+                if quantidade == placas_por_parte:
+                    escrever_parte()
+                    yield saida.retirar()
+
+        if pendentes:
+            escrever_parte()
+        
+        if delta is not None:
+            delta.concluir(relatorio)
+
+        arquivo_zip.writestr(
+            'relatorio.json',
+            json.dumps(relatorio, ensure_ascii=False, indent=2, default=str)
+        )
+
+    yield saida.retirar()
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+# Mesmas mensagens de GeradorPlacas.validar_produto
+NOME_EM_BRANCO = "Nome do produto está em branco"
+NOME_CURTO = "Nome do produto muito curto"
+PRECO_EM_BRANCO = "Preço está em branco"
+PRECO_INVALIDO = "Preço inválido"
+DATA_EM_BRANCO = "Data da oferta está em branco"
+DATA_FORMATO = "Data da oferta deve estar no formato dd/mm/aaaa"
+DATA_INVALIDA = "Data da oferta inválida"
+CODIGO_INVALIDO = "Código de barras deve ter 13 dígitos para EAN13"
+
+# Caminho rápido para os preços mais comuns; o resto é conferido com float()
+_PADRAO_NUMERO = r'^\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*$'
+_PADRAO_DATA = r'^\d{2}/\d{2}/\d{4}$'
+_DIAS_POR_MES = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def coluna(df, nome, padrao=None):
+    """Retorna a coluna pelo nome (a última, se houver repetidas) ou uma série preenchida com o padrão"""
+    posicoes = [i for i, col in enumerate(df.columns) if col == nome]
+    if not posicoes:
+        return pd.Series(padrao, index=df.index, dtype=object)
+    return df.iloc[:, posicoes[-1]]
+
+
+def _vazio(serie):
+    """Equivalente vetorizado de pd.isna(v) or not v or str(v).strip() == ''"""
+    nulo = serie.isna().to_numpy()
+    falso = np.zeros(len(serie), dtype=bool)
+    if (~nulo).any():
+        falso[~nulo] = ~serie[~nulo].to_numpy().astype(bool)
+    texto = serie.astype(str).str.strip()
+    return nulo | falso | (texto == '').to_numpy(), texto
+
+
+def _float_valido(texto):
+    """Máscara dos textos aceitos por float(), testando cada valor distinto uma única vez"""
+    ok = texto.str.match(_PADRAO_NUMERO).to_numpy(dtype=bool)
+    restantes = texto[~ok]
+    if len(restantes):
+        aceitos = set()
+        for valor in restantes.unique():
+            try:
+                float(valor)
+                aceitos.add(valor)
+            except ValueError:
+                pass
+        ok[~ok] = restantes.isin(aceitos).to_numpy()
+    return ok
+
+
+def _inteiros(texto):
+    try:
+        return texto.astype(np.int64).to_numpy()
+    except ValueError:
+        # Dígitos não ASCII (aceitos por \d e int()) ficam para a conversão em Python
+        return texto.map(int).to_numpy(dtype=np.int64)
+
+
+def _data_valida(texto):
+    """Confere dia/mês/ano de textos já no formato dd/mm/aaaa"""
+    if len(texto) == 0:
+        return np.zeros(0, dtype=bool)
+    dia, mes, ano = (_inteiros(texto.str[inicio:fim]) for inicio, fim in ((0, 2), (3, 5), (6, 10)))
+
+    mes_ok = (mes >= 1) & (mes <= 12)
+    bissexto = ((ano % 4 == 0) & (ano % 100 != 0)) | (ano % 400 == 0)
+    dias_mes = _DIAS_POR_MES[np.where(mes_ok, mes, 0)] + (bissexto & (mes == 2))
+    return mes_ok & (ano >= 1) & (dia >= 1) & (dia <= dias_mes)
+
+
+def validar_dataframe(df):
+    """Valida todas as linhas por colunas e retorna {posição: [problemas]} das linhas inválidas"""
+    n = len(df)
+    if n == 0:
+        return {}
+
+    # Nome do produto
+    nome_vazio, nome_texto = _vazio(coluna(df, 'Nome do produto'))
+    nome_curto = ~nome_vazio & (nome_texto.str.len() < 2).to_numpy()
+
+    # Preço
+    preco = coluna(df, 'Preço')
+    preco_vazio, _ = _vazio(preco)
+    preco_invalido = np.zeros(n, dtype=bool)
+    if (~preco_vazio).any():
+        preco_texto = preco[~preco_vazio].astype(str).str.replace(',', '.', regex=False)
+        preco_invalido[~preco_vazio] = ~_float_valido(preco_texto)
+
+    # Data da oferta
+    data_vazia, data_texto = _vazio(coluna(df, 'Data da Oferta'))
+    formato_ok = ~data_vazia & data_texto.str.match(_PADRAO_DATA).to_numpy(dtype=bool)
+    data_formato = ~data_vazia & ~formato_ok
+    data_invalida = np.zeros(n, dtype=bool)
+    data_invalida[formato_ok] = ~_data_valida(data_texto[formato_ok])
+
+    # Código de barras (opcional)
+    codigo_vazio, codigo_texto = _vazio(coluna(df, 'Codigo de Barras'))
+    codigo_invalido = ~codigo_vazio & (
+        (codigo_texto.str.len() != 13) | ~codigo_texto.str.isdigit()
+    ).to_numpy()
+
+    verificacoes = [
+        (nome_vazio, NOME_EM_BRANCO),
+        (nome_curto, NOME_CURTO),
+        (preco_vazio, PRECO_EM_BRANCO),
+        (preco_invalido, PRECO_INVALIDO),
+        (data_vazia, DATA_EM_BRANCO),
+        (data_formato, DATA_FORMATO),
+        (data_invalida, DATA_INVALIDA),
+        (codigo_invalido, CODIGO_INVALIDO),
+    ]
+
+    # Cada combinação de problemas vira um bit; as listas são montadas uma vez por combinação
+    combinacoes = np.zeros(n, dtype=np.int64)
+    for bit, (mascara, _) in enumerate(verificacoes):
+        combinacoes |= mascara.astype(np.int64) << bit
+
+    posicoes = np.flatnonzero(combinacoes)
+    mensagens = {
+        int(combinacao): [msg for bit, (_, msg) in enumerate(verificacoes) if combinacao >> bit & 1]
+        for combinacao in np.unique(combinacoes[posicoes])
+    }
+    return {
+        pos: list(mensagens[combinacao])
+        for pos, combinacao in zip(posicoes.tolist(), combinacoes[posicoes].tolist())
+    }
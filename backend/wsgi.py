@@ -0,0 +1,21 @@
+"""Ponto de entrada WSGI para produção
+
+Linux/macOS: gunicorn -c gunicorn.conf.py wsgi:app
+Windows:     python wsgi.py  (usa o waitress)
+"""
+import os
+
+from app import app, aquecer
+
+if __name__ == '__main__':
+    from waitress import serve
+
+    if os.environ.get('PLACAS_PRELOAD') == '1':
+        aquecer()
+    serve(
+        app,
+        host=os.environ.get('PLACAS_HOST', '0.0.0.0'),
+        port=int(os.environ.get('PLACAS_PORTA', 5000)),
+        threads=int(os.environ.get('PLACAS_THREADS', 8)),
+        channel_timeout=int(os.environ.get('PLACAS_TIMEOUT', 300))
+    )
@@ -5,6 +5,7 @@ class PlacasOfertasApp {
         this.perfis = [];
         this.perfilAtual = null;
         this.previewIndice = 0;
+        this.trabalhoAtual = null;
         
         this.config = {
             tamanho: 'A4',
@@ -676,6 +677,14 @@ class PlacasOfertasApp {
                 placaEditor.style.width = '297px';
                 placaEditor.style.height = '420px';
                 break;
+            case '8-up':
+                placaEditor.style.width = '297px';
+                placaEditor.style.height = '210px';
+                break;
+            case '16-up':
+                placaEditor.style.width = '148px';
+                placaEditor.style.height = '210px';
+                break;
             case 'A3':
                 placaEditor.style.width = '842px';
                 placaEditor.style.height = '1191px';
@@ -967,32 +976,47 @@ class PlacasOfertasApp {
     }
 
     async imprimirTodasValidas() {
-        // Coletar todos os produtos válidos restantes
-        for (let i = this.produtoIndexConfirmacao; i < this.produtos.length; i++) {
-            try {
-                const response = await fetch('http://localhost:5000/api/gerar_placas_confirmacao', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        filename: this.currentFile,
-                        config: this.config,
-                        produto_index: i
-                    })
-                });
+        // Validar todos os produtos restantes em uma única requisição
+        const inicio = this.produtoIndexConfirmacao;
+        const fim = this.produtos.length;
 
-                const data = await response.json();
-                if (response.ok && data.valido) {
-                    this.produtosConfirmados.push(i);
-                } else {
+        try {
+            const response = await fetch('http://localhost:5000/api/validar_produtos', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    filename: this.currentFile,
+                    inicio: inicio,
+                    fim: fim
+                })
+            });
+
+            const data = await response.json();
+            if (response.ok) {
+                data.resultados.forEach(resultado => {
+                    if (resultado.valido) {
+                        this.produtosConfirmados.push(resultado.indice);
+                    } else {
+                        this.produtosPulados.push({
+                            index: resultado.indice,
+                            produto: this.produtos[resultado.indice],
+                            problemas: resultado.problemas
+                        });
+                    }
+                });
+            } else {
+                for (let i = inicio; i < fim; i++) {
                     this.produtosPulados.push({
                         index: i,
                         produto: this.produtos[i],
-                        problemas: data.problemas || ['Erro desconhecido']
+                        problemas: [data.error || 'Erro desconhecido']
                     });
                 }
-            } catch (error) {
+            }
+        } catch (error) {
+            for (let i = inicio; i < fim; i++) {
                 this.produtosPulados.push({
                     index: i,
                     produto: this.produtos[i],
@@ -1012,7 +1036,7 @@ class PlacasOfertasApp {
         }
 
         try {
-            const response = await fetch('http://localhost:5000/api/gerar_placas', {
+            const response = await fetch('http://localhost:5000/api/trabalhos', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -1027,9 +1051,8 @@ class PlacasOfertasApp {
             const data = await response.json();
 
             if (response.ok) {
-                this.showDownloadLink(data.pdf_url);
-                this.mostrarRelatorioFinal(data.relatorio);
-                this.showStatus(`PDF gerado com ${this.produtosConfirmados.length} placas!`, 'success');
+                this.trabalhoAtual = data.id;
+                await this.acompanharTrabalho(data.status_url);
             } else {
                 this.showStatus(`Erro: ${data.error}`, 'error');
             }
@@ -1038,6 +1061,51 @@ class PlacasOfertasApp {
         }
     }
 
+    async acompanharTrabalho(statusUrl) {
+        // Consultar o andamento da geração até o trabalho terminar
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+
+            const response = await fetch(`http://localhost:5000${statusUrl}`);
+            const data = await response.json();
+
+            if (!response.ok) {
+                this.showStatus(`Erro: ${data.error}`, 'error');
+                return;
+            }
+
+            if (data.estado === 'concluido') {
+                this.trabalhoAtual = null;
+                this.showDownloadLink(data.pdf_url);
+                this.mostrarRelatorioFinal(data.relatorio);
+                this.showStatus(`PDF gerado com ${data.relatorio.produtos_validos} placas!`, 'success');
+                return;
+            }
+
+            if (data.estado === 'erro' || data.estado === 'cancelado') {
+                this.trabalhoAtual = null;
+                const mensagem = data.estado === 'erro' ? `Erro ao gerar PDF: ${data.erro}` : 'Geração do PDF cancelada.';
+                this.showStatus(mensagem, data.estado === 'erro' ? 'error' : 'warning');
+                return;
+            }
+
+            const andamento = data.total ? `${data.renderizados} de ${data.total} placas` : 'aguardando na fila';
+            this.showStatus(`Gerando PDF: ${andamento}...`, 'success');
+        }
+    }
+
+    async cancelarTrabalho() {
+        if (!this.trabalhoAtual) return;
+
+        try {
+            await fetch(`http://localhost:5000/api/trabalhos/${this.trabalhoAtual}/cancelar`, {
+                method: 'POST'
+            });
+        } catch (error) {
+            this.showStatus('Erro de conexão com o servidor.', 'error');
+        }
+    }
+
     mostrarRelatorioFinal(relatorio) {
         const relatorioSection = document.getElementById('relatorioSection');
         const relatorioContent = document.getElementById('relatorioContent');
@@ -1082,6 +1150,7 @@ class PlacasOfertasApp {
     }
 
     cancelarConfirmacao() {
+        this.cancelarTrabalho();
         this.mostrarSecao('gerar');
     }
 